@@ -1,36 +1,81 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import pickle as pkl
-from PIL import Image
 import io
+import os
 from lightgbm import LGBMClassifier
 import category_encoders as ce
 from imblearn.ensemble import EasyEnsembleClassifier
 import shap
 import plotly.express as px
-
-# Load the pickled model and encoder
-with open('best_model.pkl', 'rb') as model_file:
-    model = pkl.load(model_file)
-
-with open('cbe_encoder.pkl', 'rb') as encoder_file:
-    encoder = pkl.load(encoder_file)
-
-logo = Image.open("logo.jpg")
+from whatif import what_if_sweep, optimize_lifestyle
+from features import FEATURE_LABELS
+from early_exit import predict_risk_early_exit
+from artifacts import load_encoder, load_model, load_scoring_model, model_version
+from drift_monitor import get_monitor
+from audit_log import get_audit_log
+from model_registry import get_registry
+from inference_executor import get_executor
+from rescoring import get_rescorer
+from similar_patients import DISTANCE_LABELS, get_similar_index
+from result_cache import get_result_cache
+from recommendations import contribution_chart_data, importance_shares, recommendations, risk_summary
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from static_assets import css_file_tag, image_png, page_icon, static_markup
+import service_metrics
+
+# Optional anytime mode: stop evaluating ensemble members once the risk band is settled
+EARLY_EXIT = os.environ.get('HEART_EARLY_EXIT') == '1'
+
+# Model and SHAP calls run on bounded worker slots shared by all sessions, queued fairly per session
+inference = get_executor()
+
+
+@st.cache_resource(show_spinner=False)
+def load_artifacts(version):
+    # Unpickled once per process and model version and shared by every session and rerun.
+    # Risk scores come from the full ensemble or the distilled fast tier (HEART_MODEL_TIER=distilled);
+    # SHAP explanations always use the full ensemble.
+    model = load_model()
+    encoder = load_encoder()
+    scoring_model = load_scoring_model(model)
+    inference.limit_threads(model)
+    inference.limit_threads(scoring_model)
+    # Re-assessments only re-evaluate the trees that split on fields changed since the session's last one
+    return model, encoder, scoring_model, get_rescorer(scoring_model, encoder)
+
+# Process-wide monitor of incoming profiles against the BRFSS reference distributions
+drift_monitor = get_monitor()
+
+# Append-only audit log of every assessment
+audit_log = get_audit_log()
+MODEL_VERSION = model_version()
+model, encoder, scoring_model, rescorer = load_artifacts(MODEL_VERSION)
+
+# Optional multi-version registry (HEART_MODEL_REGISTRY=models): sessions are routed to versions by sticky hash
+model_registry = get_registry()
+
+# Index of BRFSS respondents by profile, if built with similar_patients.py
+similar_index = get_similar_index()
+
+# Results shared across processes and restarts (HEART_RESULT_CACHE=path). Only the default scoring
+# path uses it, since only there a result depends on nothing but the profile and MODEL_VERSION.
+result_cache = get_result_cache() if not EARLY_EXIT and model_registry is None else None
+
+# Logo and icon are decoded and resized once per process
+logo = image_png("logo.jpg", 100)
 
 # Load the dataset for reference
 data = pd.read_csv('brfss2022_data_wrangling_output.zip', compression='zip')
 data['heart_disease'] = data['heart_disease'].apply(lambda x: 1 if x == 'yes' else 0).astype('int')
 
-icon = Image.open("logo.jpg")
+icon = page_icon("logo.jpg")
 st.set_page_config(layout='wide', page_title='AI-Powered Heart Disease Assessment', page_icon=icon)
 # Change 200 to whatever size looks good
 
 # Custom CSS
 def local_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    st.markdown(css_file_tag(file_name), unsafe_allow_html=True)
 
 # Main layout with three columns
 row0_0, row0_1, row0_2, row0_3 = st.columns((0.08, 6, 3, 0.17))
@@ -40,18 +85,18 @@ with st.container():
     with col1:
         st.image(logo, width=100)
     with col2:
-        st.markdown("""
+        st.markdown(static_markup("""
         <div class="header-text">
             <h1>HoloMed AI Production: Heart Disease Predictor</h1>
             <p>Unmatched Accuracy with Cutting-Edge Machine Learning Models</p>
         </div>
-        """, unsafe_allow_html=True)
+        """), unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
 st.write('---')
 
 # Flexbox container for equal height boxes
-st.markdown("""
+st.markdown(static_markup("""
 <div class="flex-container">
     <div class="flex-item introduction">
         <h2>What this is</h2>
@@ -67,7 +112,7 @@ st.markdown("""
         </ul>
     </div>
 </div>
-""", unsafe_allow_html=True)
+"""), unsafe_allow_html=True)
 
 st.write('---')
 
@@ -173,197 +218,63 @@ btn1 = row8_1.button('Get Your Heart disease Risk Assessment')
 
 if btn1:
     try:
-        risk = predict_heart_disease_risk(input_data, model, encoder)
+        session_id = get_script_run_ctx().session_id
+        # With the registry, every model call of this session (risk, SHAP, what-if, plans) uses its routed version
+        if model_registry is not None:
+            assessed_version = model_registry.route(session_id)
+            session_model = session_scoring_model = model_registry.get(assessed_version)
+        else:
+            assessed_version = MODEL_VERSION
+            session_model, session_scoring_model = model, scoring_model
+        cached = result_cache.get(input_data, MODEL_VERSION) if result_cache is not None else None
+        if cached is not None:
+            risk = cached[0]
+        elif EARLY_EXIT:
+            risk, members_evaluated = inference.run(session_id, predict_risk_early_exit, input_data, session_model, encoder)
+            row8_1.caption(f"Early-exit mode: evaluated {members_evaluated} of {len(session_model.estimators_)} ensemble members")
+        elif model_registry is not None:
+            risk, _ = inference.run(session_id, model_registry.predict_risk, input_data, encoder,
+                                    version=assessed_version)
+        elif rescorer is not None:
+            scored = inference.run(session_id, rescorer.score, input_data, st.session_state.get('scored_profile'))
+            st.session_state['scored_profile'] = scored
+            risk = scored.risk
+        else:
+            risk = inference.run(session_id, predict_heart_disease_risk, input_data, scoring_model, encoder)
+        drift_monitor.observe(input_data)
+        audit_log.record(input_data, risk, assessed_version)
         with row8_1:
             st.write(f"Predicted Heart Disease Risk: {risk:.2f}%")
+            # Observed outcomes of the survey respondents with the most similar answers
+            if similar_index is not None:
+                similar = similar_index.summary(input_data)
+                st.write("#### People With Answers Like Yours")
+                if similar.empty:
+                    st.write("No survey respondents gave answers within two questions of yours.")
+                for row in similar.itertuples():
+                    st.write(f"- {DISTANCE_LABELS[row.Distance]}: {row.Respondents} respondents, {row.Rate:.1f}% had heart disease")
             input_df = pd.DataFrame([input_data])
             input_encoded = encoder.transform(input_df, y=None, override_return_df=False)
-            lgbm_model = model.estimators_[0].steps[-1][1]
-            explainer = shap.TreeExplainer(lgbm_model)
-            shap_values = explainer.shap_values(input_encoded)
-            try:
-                shap_array = shap_values[1]
-            except IndexError:
-                shap_array = shap_values
-
-            feature_importances = np.abs(shap_array).sum(axis=0)
-            feature_importances /= feature_importances.sum()
-            feature_importances *= 100
-            feature_importance_df = pd.DataFrame({
-                'Feature': input_encoded.columns,
-                'Importance': feature_importances
-            }).sort_values(by='Importance', ascending=False)
-
-            recommendations = []
-            if risk > 70:
-                recommendations.append("Your risk of heart disease is very high. Here are some recommendations to reduce your risk:")
-            elif risk > 40:
-                recommendations.append("Your risk of heart disease is high. Here are some recommendations to reduce your risk:")
-            elif risk > 25:
-                recommendations.append("Your risk of heart disease is moderate. Here are some recommendations to reduce your risk:")
+            if cached is not None and cached[1] is not None:
+                shap_array = cached[1][None, :]
             else:
-                recommendations.append("Your risk of heart disease is low. Keep up the good work and continue to maintain a healthy lifestyle.")
+                lgbm_model = session_model.estimators_[0].steps[-1][1]
+                explainer = shap.TreeExplainer(lgbm_model)
+                shap_values = inference.run(session_id, explainer.shap_values, input_encoded)
+                try:
+                    shap_array = shap_values[1]
+                except IndexError:
+                    shap_array = shap_values
+                if result_cache is not None:
+                    result_cache.put(input_data, MODEL_VERSION, risk, np.asarray(shap_array)[0])
+
+            shares = importance_shares(shap_array, input_encoded.columns)
 
             if risk > 25:
-                cumulative_importance = 0
-                important_features = set()
-                for index, row in feature_importance_df.iterrows():
-                    cumulative_importance += row['Importance']
-                    important_features.add(row['Feature'])
-                    if cumulative_importance >= 50:
-                        break
-                
-                # Ensure unique features are added only once
-                additional_features = [
-                    ('ever_told_you_had_diabetes', diabetes == "yes"),
-                    ('ever_diagnosed_with_heart_attack', heart_attack == "yes"),
-                    ('ever_told_you_had_a_depressive_disorder', depressive_disorder == "yes"),
-                    ('ever_diagnosed_with_a_stroke', stroke == "yes"),
-                    ('age_category', age_category in ["Age_55_to_59", "Age_60_to_64", "Age_65_to_69", "Age_70_to_74", "Age_75_to_79", "Age_80_or_older"]),
-                    ('length_of_time_since_last_routine_checkup', length_of_time_since_last_routine_checkup in ["Age_55_to_59", "Age_60_to_64", "Age_65_to_69", "Age_70_to_74", "Age_75_to_79", "Age_80_or_older"]),
-                    ('general_health', general_health in ["fair", "poor"]),
-                    ('BMI', bmi in ["overweight_bmi_25_to_29_9", "obese_bmi_30_or_more"]),
-                    ('smoking_status', smoking_status != "never_smoked"),
-                    ('exercise_status_in_past_30_Days', exercise_status == "no"),
-                    ('binge_drinking_status', binge_drinking_status == "yes"),
-                    ('drinks_category', drinks_category in ["high_consumption_10.01_to_20_drinks", "very_high_consumption_more_than_20_drinks"]),
-                    ('sleep_category', sleep_category in ["short_sleep_4_to_5_hours", "very_short_sleep_0_to_3_hours"]),
-                    ('physical_health_status', physical_health in ["1_to_13_days_not_good", "14_plus_days_not_good"]),
-                    ('mental_health_status', mental_health in ["1_to_13_days_not_good", "14_plus_days_not_good"]),
-                    ('asthma_Status', asthma in ["current_asthma", "former_asthma"]),
-                    ('difficulty_walking_or_climbing_stairs', walking == "yes"),
-                    ('length_of_time_since_last_routine_checkup', length_of_time_since_last_routine_checkup != "past_year"),
-                    ('could_not_afford_to_see_doctor', could_not_afford_to_see_doctor == "yes"),
-                    ('health_care_provider', health_care_provider == "no"),
-                    ('ever_told_you_have_kidney_disease', kidney_disease == "yes")
-                ]
-
-                for feature, condition in additional_features:
-                    if condition:
-                        important_features.add(feature)
-
-                # Mapping for feature names to user-friendly names
-                feature_name_mapping = {
-                    'ever_diagnosed_with_heart_attack': 'Heart Attack',
-                    'general_health': 'General Health',
-                    'ever_diagnosed_with_a_stroke': 'Stroke',
-                    'ever_told_you_have_kidney_disease': 'Kidney Disease',
-                    'ever_told_you_had_diabetes': 'Diabetes',
-                    'physical_health_status': 'Physical Health',
-                    'ever_told_you_had_a_depressive_disorder': 'Depression',
-                    'sleep_category': 'Sleep',
-                    'age_category': 'Age',
-                    'length_of_time_since_last_routine_checkup': 'Checkup Time',
-                    'BMI': 'BMI',
-                    'smoking_status': 'Smoking',
-                    'exercise_status_in_past_30_Days': 'Exercise',
-                    'binge_drinking_status': 'Binge Drinking',
-                    'drinks_category': 'Alcohol',
-                    'could_not_afford_to_see_doctor': 'Doctor Access',
-                    'health_care_provider': 'Healthcare Provider',
-                    'asthma_Status': 'Asthma',
-                    'difficulty_walking_or_climbing_stairs': 'Mobility',
-                    'mental_health_status': 'Mental Health',
-                }
-
-                # Ensure that the features with recommendations are included in the final features list
-                final_features = []
-                feature_to_recommendation = {}
-                for feature in important_features:
-                    importance = feature_importance_df.loc[feature_importance_df['Feature'] == feature, 'Importance'].values[0]
-                    if feature == 'ever_diagnosed_with_heart_attack' and heart_attack == "yes":
-                        recommendation = f"- History of heart attack contributed {importance:.2f}% to your risk. Regularly visit your cardiologist and adhere to prescribed medications. Monitor any new or worsening symptoms and seek immediate medical attention if needed."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'ever_diagnosed_with_a_stroke' and stroke == "yes":
-                        recommendation = f"- History of stroke contributed {importance:.2f}% to your risk. Follow your neurologist's recommendations and take prescribed medications consistently. Engage in approved physical therapy or exercises to regain strength and mobility."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'age_category' and age_category in ["Age_55_to_59", "Age_60_to_64", "Age_65_to_69", "Age_70_to_74", "Age_75_to_79", "Age_80_or_older"]:
-                        recommendation = f"- Age category contributed {importance:.2f}% to your risk. While you can't change your age, maintaining a healthy lifestyle can mitigate risks associated with aging. Ensure regular check-ups, eat a balanced diet, stay active, and avoid smoking."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'general_health' and general_health in ["fair", "poor"]:
-                        recommendation = f"- General health contributed {importance:.2f}% to your risk. Focus on improving your overall health through a balanced diet and regular check-ups."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'ever_told_you_have_kidney_disease' and kidney_disease == "yes":
-                        recommendation = f"- Kidney disease contributed {importance:.2f}% to your risk. Regularly monitor your kidney function and follow your doctor's advice to manage your condition. Stay hydrated and maintain a kidney-friendly diet."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'ever_told_you_had_diabetes' and diabetes == "yes":
-                        recommendation = f"- Diabetes contributed {importance:.2f}% to your risk. Manage your diabetes through diet, exercise, and medication as prescribed by your doctor."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'smoking_status' and smoking_status != "never_smoked":
-                        recommendation = f"- Smoking status contributed {importance:.2f}% to your risk. Quit smoking to significantly reduce your risk of heart disease."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'exercise_status_in_past_30_Days' and exercise_status == "no":
-                        recommendation = f"- Lack of exercise contributed {importance:.2f}% to your risk. Engage in regular physical activity to improve your heart health."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'binge_drinking_status' and binge_drinking_status == "yes":
-                        recommendation = f"- Binge drinking contributed {importance:.2f}% to your risk. Reducing or eliminating alcohol consumption can significantly lower your risk of heart disease. Consider seeking support for alcohol moderation or cessation if needed."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'drinks_category' and drinks_category in ["high_consumption_10.01_to_20_drinks", "very_high_consumption_more_than_20_drinks"]:
-                        recommendation = f"- Alcohol consumption contributed {importance:.2f}% to your risk. Limit alcohol consumption to lower your risk."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'sleep_category' and sleep_category in ["short_sleep_4_to_5_hours", "very_short_sleep_0_to_3_hours"]:
-                        recommendation = f"- Sleep category contributed {importance:.2f}% to your risk. Consider aiming for 7-9 hours of quality sleep each night. Adequate sleep is crucial for maintaining heart health."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'physical_health_status' and physical_health in ["1_to_13_days_not_good", "14_plus_days_not_good"]:
-                        recommendation = f"- Physical health contributed {importance:.2f}% to your risk. Engage in regular physical activity and consult a healthcare provider if you have persistent physical health issues."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'mental_health_status' and mental_health in ["1_to_13_days_not_good", "14_plus_days_not_good"]:
-                        recommendation = f"- Mental health contributed {importance:.2f}% to your risk. Consider seeking support from a mental health professional and practice stress-reducing activities."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'asthma_Status' and asthma in ["current_asthma", "former_asthma"]:
-                        recommendation = f"- Asthma contributed {importance:.2f}% to your risk. Manage your asthma by following your treatment plan, avoiding asthma triggers, and using your medications as prescribed."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'ever_told_you_had_a_depressive_disorder' and depressive_disorder == "yes":
-                        recommendation = f"- Depressive disorder contributed {importance:.2f}% to your risk. Consider seeking support from a mental health professional, practicing stress-reducing activities, and maintaining a healthy lifestyle to manage depressive symptoms."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'difficulty_walking_or_climbing_stairs' and walking == "yes":
-                        recommendation = f"- Difficulty walking or climbing stairs contributed {importance:.2f}% to your risk. Consider consulting with a healthcare provider for appropriate interventions and exercises to improve mobility and strength."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'length_of_time_since_last_routine_checkup' and length_of_time_since_last_routine_checkup != "past_year":
-                        recommendation = f"- Time since last routine checkup contributed {importance:.2f}% to your risk. Regular health checkups are important for early detection and management of health conditions. Schedule regular appointments with your healthcare provider to monitor and maintain your heart health."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'could_not_afford_to_see_doctor' and could_not_afford_to_see_doctor == "yes":
-                        recommendation = f"- Difficulty affording to see a doctor contributed {importance:.2f}% to your risk. Explore community health services, sliding scale clinics, or health insurance options to ensure you have access to necessary medical care."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'health_care_provider' and health_care_provider == "no":
-                        recommendation = f"- Not having a primary health care provider contributed {importance:.2f}% to your risk. Establishing a relationship with a primary care provider can help manage and prevent health issues. Consider finding a primary health care provider to ensure regular check-ups and consistent medical advice."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)
-                    if feature == 'BMI' and bmi in ["overweight_bmi_25_to_29_9", "obese_bmi_30_or_more"]:
-                        recommendation = f"- BMI contributed {importance:.2f}% to your risk. Maintaining a healthy weight through a balanced diet and regular exercise can help reduce your risk of heart disease. Consider consulting a healthcare provider for personalized advice."
-                        feature_to_recommendation[feature] = recommendation
-                        final_features.append(feature)    
-
-                # Calculate the remaining contribution for "Other Factors"
-                total_importance = sum([feature_importance_df.loc[feature_importance_df['Feature'] == feature, 'Importance'].values[0] for feature in final_features])
-                other_factors_importance = 100 - total_importance
-
-                # Prepare data for the pie chart
-                pie_data = {
-                    'Feature': [feature_name_mapping[feature] for feature in final_features] + ['Other Factors'],
-                    'Importance': [feature_importance_df.loc[feature_importance_df['Feature'] == feature, 'Importance'].values[0] for feature in final_features] + [other_factors_importance]
-                }
-                pie_df = pd.DataFrame(pie_data)
-
-                # Create the pie chart
+                factor_recommendations = recommendations(input_data, shares)
+
+                # Pie chart of the factors with recommendations
+                pie_df = contribution_chart_data(shares, [feature for feature, _ in factor_recommendations])
                 fig = px.pie(pie_df, names='Feature', values='Importance') #, title='Contribution to Heart Disease Risk'
 
                 # Display the pie chart
@@ -373,12 +284,39 @@ if btn1:
                              """)
                     st.plotly_chart(fig)
 
-                # Display recommendations in sorted order
-                sorted_recommendations = sorted([(feature, feature_to_recommendation[feature]) for feature in final_features], key=lambda x: feature_importance_df.loc[feature_importance_df['Feature'] == x[0], 'Importance'].values[0], reverse=True)
-                for feature, recommendation in sorted_recommendations:
-                    st.write(recommendation)
+                # Display recommendations, largest contribution first
+                for _, recommendation in factor_recommendations:
+                    st.write(f"- {recommendation}")
             else:
-                st.write("Your risk of heart disease is low. Keep up the good work and continue to maintain a healthy lifestyle.")
+                st.write(risk_summary(risk))
+
+            # What-if panel: every single-field alternative scored in one batch
+            _, sweep_df = inference.run(session_id, what_if_sweep, input_data, session_scoring_model, encoder,
+                                        base=st.session_state.get('scored_profile'))
+            st.write("#### What If You Changed One Thing?")
+            lifestyle_df = sweep_df[sweep_df['Modifiable'] & sweep_df['Healthier']]
+            st.dataframe(
+                lifestyle_df[['Factor', 'Option', 'Risk', 'Delta']].style.format({'Risk': '{:.2f}%', 'Delta': '{:+.2f}%'}),
+                hide_index=True
+            )
+            with st.expander("All factors"):
+                st.dataframe(
+                    sweep_df[['Factor', 'Option', 'Risk', 'Delta']].style.format({'Risk': '{:.2f}%', 'Delta': '{:+.2f}%'}),
+                    hide_index=True
+                )
+
+            # Smallest combinations of lifestyle changes that reach the low risk band
+            if risk > 25:
+                st.write("#### Smallest Lifestyle Changes to Reach Low Risk")
+                plans = inference.run(session_id, optimize_lifestyle, input_data, session_scoring_model, encoder,
+                                      target=25, version=assessed_version)
+                if not plans:
+                    st.write("None of your lifestyle answers has a healthier option that lowers your predicted risk.")
+                elif not plans[0]['reaches_target']:
+                    st.write("No combination of lifestyle changes brings your risk below 25%. These come closest:")
+                for i, plan in enumerate(plans, start=1):
+                    changes = ", ".join(f"{FEATURE_LABELS[feature]}: {input_data[feature]} → {option}" for feature, option in plan['changes'].items())
+                    st.write(f"{i}. {changes} (predicted risk {plan['risk']:.2f}%)")
 
     except Exception as e:
         row8_1.error(e)
@@ -403,7 +341,7 @@ with row9_1.expander("Leave Us a Comment or Question"):
             <button type="submit">Send</button>
         </form>
     """
-    st.markdown(contact_form, unsafe_allow_html=True)
+    st.markdown(static_markup(contact_form), unsafe_allow_html=True)
 
     # Use Local CSS File
     local_css("style.css")
@@ -411,7 +349,7 @@ with row9_1.expander("Leave Us a Comment or Question"):
 null10_0, row10_1, row10_2 = st.columns((0.04, 7, 0.4))
 with row10_1:
     st.markdown(
-        """
+        static_markup("""
         <a href="https://www.instagram.com/holomedai" target="_blank">
         <button style="background-color:#C13584; color:white; padding:5px 10px; border:none; border-radius:6px; cursor:pointer;">
             HoloMed AI Instagram
@@ -424,6 +362,11 @@ with row10_1:
         </a>
         <br><br>
         <h6>© HoloMed AI, 2025</h6>
-        """,
+        """),
         unsafe_allow_html=True
-    )
\ No newline at end of file
+    )
+
+# Service metrics for operators (HEART_SERVICE_METRICS=1)
+if service_metrics.ENABLED:
+    with st.sidebar.expander("Service metrics"):
+        st.json(service_metrics.snapshot())
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import pickle as pkl
+from functools import lru_cache
+
+import pandas as pd
+
+from features import FEATURE_NAMES
+
+# Default locations, same as the apps
+MODEL_PATH = 'best_model.pkl'
+ENCODER_PATH = 'cbe_encoder.pkl'
+DATA_PATH = 'brfss2022_data_wrangling_output.zip'
+DISTILLED_MODEL_PATH = 'distilled_model.pkl'
+
+
+def load_model(path=MODEL_PATH):
+    with open(path, 'rb') as model_file:
+        return pkl.load(model_file)
+
+
+def load_encoder(path=ENCODER_PATH):
+    with open(path, 'rb') as encoder_file:
+        return pkl.load(encoder_file)
+
+
+def load_scoring_model(model, tier=None, distilled_path=DISTILLED_MODEL_PATH):
+    # Model used for risk scores: 'full' is the ensemble itself, 'distilled' is
+    # the fast tier written by distill.py. Defaults to HEART_MODEL_TIER. The full
+    # ensemble stays loaded for SHAP either way, so the distilled tier saves time, not memory.
+    tier = tier or os.environ.get('HEART_MODEL_TIER', 'full')
+    if tier == 'full':
+        return model
+    if tier == 'distilled':
+        return load_model(distilled_path)
+    raise ValueError(f"Unknown model tier: {tier}")
+
+
+@lru_cache(maxsize=16)
+def _file_digest(path, mtime):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as model_file:
+        for block in iter(lambda: model_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def model_version(path=MODEL_PATH, tier=None, distilled_path=DISTILLED_MODEL_PATH):
+    # Short content hash of the model file, with the scoring tier when it isn't the full model.
+    # The distilled tier scores with its own artifact, so its hash is part of the version too.
+    # Cached per modification time, so app reruns don't re-hash the files.
+    version = _file_digest(path, os.path.getmtime(path))[:12]
+    tier = tier or os.environ.get('HEART_MODEL_TIER', 'full')
+    if tier == 'full':
+        return version
+    if tier == 'distilled':
+        return f"{version}:distilled:{_file_digest(distilled_path, os.path.getmtime(distilled_path))[:12]}"
+    return f"{version}:{tier}"
+
+
+def load_reference_data(path=DATA_PATH, sample=None, random_state=0):
+    # BRFSS reference dataset with heart_disease mapped to 0/1 like in the apps
+    data = pd.read_csv(path, compression='zip')
+    data['heart_disease'] = data['heart_disease'].apply(lambda x: 1 if x == 'yes' else 0).astype('int')
+    if sample is not None and sample < len(data):
+        data = data.sample(n=sample, random_state=random_state).reset_index(drop=True)
+    return data
+
+
+def split_features(data):
+    return data[FEATURE_NAMES], data['heart_disease'].values
@@ -0,0 +1,222 @@
+"""Bit-packed, append-only audit log of assessments.
+
+Each assessment is one fixed-size 22-byte record:
+
+    timestamp       int64    microseconds since the epoch (UTC)
+    profile         uint64   the 22 fields packed with features.pack_codes
+    risk            float32  predicted risk in %
+    model_version   uint16   id into the version table
+
+The log file starts with a magic string and the bit layout of the packed
+profile, so a reader can refuse a log written under another schema. Model
+version strings are stored once each, in a JSON sidecar (<log>.versions.json).
+Several processes can append to one log: a new version's id is allocated
+under a file lock, after re-reading the sidecar, so ids never collide.
+
+Records go into an in-memory buffer. A background thread writes it out when
+it is half full or every flush_interval seconds, so the request path never waits
+on disk. read_audit_log decodes a whole log into a DataFrame with vectorised
+numpy operations.
+"""
+import argparse
+import atexit
+import fcntl
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_BITS, FEATURE_NAMES, codes_to_frame, pack_codes, profile_codes, unpack_codes
+
+AUDIT_LOG_PATH = os.environ.get('HEART_AUDIT_LOG', os.path.join('audit', 'assessments.bin'))
+
+MAGIC = b'HDAUDIT1'
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('profile', '<u8'),
+    ('risk', '<f4'),
+    ('model_version', '<u2'),
+])
+# Layout written after the magic: field count followed by the bits of each field
+LAYOUT = struct.pack(f'<H{len(FEATURE_BITS)}B', len(FEATURE_BITS), *FEATURE_BITS)
+HEADER = MAGIC + LAYOUT
+
+
+def _versions_path(path):
+    return path + '.versions.json'
+
+
+class AuditLog:
+    def __init__(self, path=AUDIT_LOG_PATH, buffer_size=4096, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._buffer = np.zeros(buffer_size, dtype=RECORD_DTYPE)
+        self._pending = 0
+        self._written = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._check_header()
+        self._versions = self._load_versions()
+
+        self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _check_header(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, 'wb') as f:
+                f.write(HEADER)
+            return
+        with open(self.path, 'rb') as f:
+            if f.read(len(HEADER)) != HEADER:
+                raise ValueError(f"{self.path} was written with a different profile layout")
+
+    def _load_versions(self):
+        if os.path.exists(_versions_path(self.path)):
+            with open(_versions_path(self.path)) as f:
+                return json.load(f)
+        return {}
+
+    def _version_id(self, version):
+        # Called under self._lock; new versions are persisted before any record uses them.
+        # Other processes may have added versions since we loaded the table, so it is
+        # re-read under an exclusive file lock before a new id is allocated.
+        if version not in self._versions:
+            with open(_versions_path(self.path) + '.lock', 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._versions = self._load_versions()
+                if version not in self._versions:
+                    if len(self._versions) >= np.iinfo(np.uint16).max:
+                        raise ValueError("Too many model versions for one audit log")
+                    self._versions[version] = len(self._versions)
+                    tmp_path = f"{_versions_path(self.path)}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'w') as f:
+                        json.dump(self._versions, f)
+                    os.replace(tmp_path, _versions_path(self.path))
+        return self._versions[version]
+
+    def record(self, input_data, risk, model_version, timestamp=None):
+        profile = pack_codes(profile_codes(input_data))
+        timestamp = int((time.time() if timestamp is None else timestamp) * 1_000_000)
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise ValueError("Audit log is closed")
+                if self._pending < len(self._buffer):
+                    self._buffer[self._pending] = (timestamp, profile, risk, self._version_id(model_version))
+                    self._pending += 1
+                    if self._pending >= len(self._buffer) // 2:
+                        self._wake.set()
+                    return
+            # Writer fell behind: write out inline rather than drop records
+            self.flush()
+
+    def flush(self):
+        # The write lock is held across taking the buffer and writing it so
+        # records reach the file in the order they were buffered; the record
+        # lock is only held while copying, so requests keep buffering meanwhile
+        with self._write_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                data = self._buffer[:self._pending].tobytes()
+                self._pending = 0
+            with open(self.path, 'ab') as f:
+                f.write(data)
+            self._written += len(data) // RECORD_DTYPE.itemsize
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {'path': self.path, 'records_written': self._written, 'records_buffered': self._pending,
+                    'model_versions': len(self._versions)}
+
+
+def read_audit_log(path=AUDIT_LOG_PATH, decode=True):
+    """Load an audit log into a DataFrame, one row per assessment.
+
+    With decode=False the packed profile column is kept as is and the 22
+    field columns are skipped, which is much faster for large logs.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(HEADER)) != HEADER:
+            raise ValueError(f"{path} was not written with the current profile layout")
+    size = os.path.getsize(path) - len(HEADER)
+    # A record cut short by a crash mid-write is ignored
+    count = size // RECORD_DTYPE.itemsize
+    records = np.fromfile(path, dtype=RECORD_DTYPE, count=count, offset=len(HEADER))
+
+    versions = {}
+    if os.path.exists(_versions_path(path)):
+        with open(_versions_path(path)) as f:
+            versions = {index: version for version, index in json.load(f).items()}
+    version_names = np.array([versions.get(i, str(i)) for i in range(max(versions, default=-1) + 1)] or [''], dtype=object)
+
+    frame = pd.DataFrame({
+        'timestamp': pd.to_datetime(records['timestamp'], unit='us', utc=True),
+        'risk': records['risk'],
+        'model_version': pd.Categorical(version_names[records['model_version']]),
+    })
+    if not decode:
+        frame['profile'] = records['profile']
+        return frame
+    return pd.concat([frame, codes_to_frame(unpack_codes(records['profile']))], axis=1)
+
+
+# Process-wide log shared by every session
+_audit_log = None
+_audit_log_lock = threading.Lock()
+
+
+def get_audit_log():
+    global _audit_log
+    with _audit_log_lock:
+        if _audit_log is None:
+            import service_metrics
+
+            _audit_log = AuditLog()
+            service_metrics.register('audit_log', _audit_log.stats)
+        return _audit_log
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Decode an assessment audit log.')
+    parser.add_argument('path', nargs='?', default=AUDIT_LOG_PATH)
+    parser.add_argument('--output', help='write the decoded log to this .csv or .parquet file')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    log = read_audit_log(args.path)
+    elapsed = time.perf_counter() - start
+    print(f"{len(log)} assessments decoded in {elapsed:.2f}s "
+          f"({len(FEATURE_NAMES)} fields, {RECORD_DTYPE.itemsize} bytes per record)")
+    if args.output:
+        if args.output.endswith('.parquet'):
+            log.to_parquet(args.output)
+        else:
+            log.to_csv(args.output, index=False)
+    else:
+        print(log.tail())
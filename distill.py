@@ -0,0 +1,170 @@
+"""Distil the CatBoostEncoder + EasyEnsemble(LightGBM) pipeline into one compact model.
+
+The student is trained on the ensemble's own soft predictions (as logits) over
+the encoded reference data, so it needs no labels. Two kinds are available:
+
+    booster   a single small LightGBM regressor
+    additive  one lookup table per feature, summed in logit space
+
+Both expose predict_proba on the encoded matrix like the full model, so the
+distilled model can be used as a drop-in scoring tier (see
+artifacts.load_scoring_model):
+
+    python distill.py --kind booster --output distilled_model.pkl
+
+The tier makes risk scores faster but does not save memory: the apps still
+load the full ensemble next to it for SHAP explanations and early exit.
+"""
+import argparse
+import pickle as pkl
+import time
+
+import numpy as np
+
+from features import risk_band_index
+
+EPS = 1e-6
+
+
+def _logit(proba):
+    proba = np.clip(proba, EPS, 1 - EPS)
+    return np.log(proba / (1 - proba))
+
+
+def _sigmoid(logit):
+    return 1 / (1 + np.exp(-logit))
+
+
+class DistilledBooster:
+    def __init__(self, n_estimators=200, num_leaves=15, learning_rate=0.1, random_state=0):
+        from lightgbm import LGBMRegressor
+
+        self.regressor = LGBMRegressor(
+            n_estimators=n_estimators, num_leaves=num_leaves, learning_rate=learning_rate,
+            random_state=random_state, verbose=-1)
+
+    def fit(self, X_encoded, teacher_proba):
+        self.regressor.fit(np.asarray(X_encoded, dtype=float), _logit(teacher_proba))
+        return self
+
+    def predict_proba(self, X_encoded):
+        proba = _sigmoid(self.regressor.predict(np.asarray(X_encoded, dtype=float)))
+        return np.column_stack([1 - proba, proba])
+
+
+class AdditiveLookupModel:
+    # logit(p) = intercept + sum of one table entry per feature. Each encoded
+    # column only takes one value per category, so a table indexed by the
+    # encoded value is a table indexed by category.
+
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+
+    def fit(self, X_encoded, teacher_proba):
+        X = np.asarray(X_encoded, dtype=float)
+        target = _logit(teacher_proba)
+        self.values_ = [np.unique(X[:, j]) for j in range(X.shape[1])]
+
+        # One-hot design matrix, solved as ridge regression on the teacher logits
+        offsets = np.cumsum([0] + [len(values) for values in self.values_])
+        design = np.zeros((len(X), offsets[-1]), dtype=np.float32)
+        for j, values in enumerate(self.values_):
+            design[np.arange(len(X)), offsets[j] + np.searchsorted(values, X[:, j])] = 1
+        self.intercept_ = target.mean()
+        gram = design.T @ design + self.alpha * np.eye(offsets[-1])
+        weights = np.linalg.solve(gram, design.T @ (target - self.intercept_))
+        self.tables_ = [weights[offsets[j]:offsets[j + 1]] for j in range(len(self.values_))]
+        return self
+
+    def predict_proba(self, X_encoded):
+        X = np.asarray(X_encoded, dtype=float)
+        logit = np.full(len(X), self.intercept_)
+        for j, (values, table) in enumerate(zip(self.values_, self.tables_)):
+            index = np.clip(np.searchsorted(values, X[:, j]), 0, len(values) - 1)
+            # Values never seen during fitting contribute nothing
+            known = values[index] == X[:, j]
+            logit += np.where(known, table[index], 0)
+        proba = _sigmoid(logit)
+        return np.column_stack([1 - proba, proba])
+
+
+DISTILLED_KINDS = {
+    'booster': DistilledBooster,
+    'additive': AdditiveLookupModel,
+}
+
+
+def fidelity_report(teacher_proba, student_proba):
+    errors = np.abs(teacher_proba - student_proba) * 100
+    return {
+        'rows': len(teacher_proba),
+        'mean_abs_error': errors.mean(),
+        'max_abs_error': errors.max(),
+        'band_agreement': np.mean(risk_band_index(teacher_proba * 100) == risk_band_index(student_proba * 100)),
+    }
+
+
+def _single_row_latency(model, X_encoded, repeats=200):
+    row = np.asarray(X_encoded, dtype=float)[:1]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict_proba(row)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def distill(model, encoder, data, kind='booster', holdout=0.2, random_state=0, **params):
+    """Fit a distilled model on the ensemble's predictions and report its fidelity on a holdout."""
+    from artifacts import split_features
+
+    X, _ = split_features(data)
+    X_encoded = np.asarray(encoder.transform(X, y=None, override_return_df=False), dtype=float)
+    teacher = model.predict_proba(X_encoded)[:, 1]
+
+    rng = np.random.default_rng(random_state)
+    order = rng.permutation(len(X_encoded))
+    n_holdout = int(len(order) * holdout)
+    test, train = order[:n_holdout], order[n_holdout:]
+
+    student = DISTILLED_KINDS[kind](**params).fit(X_encoded[train], teacher[train])
+    report = fidelity_report(teacher[test], student.predict_proba(X_encoded[test])[:, 1])
+    report.update({
+        'kind': kind,
+        'teacher_bytes': len(pkl.dumps(model)),
+        'student_bytes': len(pkl.dumps(student)),
+        'teacher_latency_ms': _single_row_latency(model, X_encoded),
+        'student_latency_ms': _single_row_latency(student, X_encoded),
+    })
+    return student, report
+
+
+if __name__ == '__main__':
+    from artifacts import (DATA_PATH, DISTILLED_MODEL_PATH, ENCODER_PATH, MODEL_PATH,
+                           load_encoder, load_model, load_reference_data)
+
+    parser = argparse.ArgumentParser(description='Distil the ensemble into a single fast model.')
+    parser.add_argument('--kind', choices=sorted(DISTILLED_KINDS), default='booster')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--encoder', default=ENCODER_PATH)
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--sample', type=int, default=None, help='number of reference rows to use (default: all)')
+    parser.add_argument('--output', default=DISTILLED_MODEL_PATH)
+    args = parser.parse_args()
+
+    # Fit through the importable module, so the pickle refers to distill.DistilledBooster
+    # rather than __main__.DistilledBooster, which no other process could load
+    import distill as distill_module
+
+    model = load_model(args.model)
+    encoder = load_encoder(args.encoder)
+    data = load_reference_data(args.data, sample=args.sample)
+
+    student, report = distill_module.distill(model, encoder, data, kind=args.kind)
+    with open(args.output, 'wb') as model_file:
+        pkl.dump(student, model_file)
+
+    print(f"{report['kind']} on {report['rows']} holdout rows: "
+          f"MAE {report['mean_abs_error']:.3f}%, max error {report['max_abs_error']:.3f}%, "
+          f"band agreement {report['band_agreement']:.4f}")
+    print(f"size {report['teacher_bytes'] / 1e6:.2f} MB -> {report['student_bytes'] / 1e6:.2f} MB, "
+          f"single-row latency {report['teacher_latency_ms']:.2f} ms -> {report['student_latency_ms']:.2f} ms")
+    print(f"saved to {args.output}")
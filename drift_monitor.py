@@ -0,0 +1,244 @@
+"""Constant-memory input drift monitor for incoming assessment profiles.
+
+Every profile submitted for assessment is recorded. Each field has an exact
+counter per option, and each pair of fields an exact counter per combination
+of options (3,301 counters over the 231 pairs). Counters are kept per time
+bucket, so reports cover a rolling window (the last hour by default) rather
+than everything since start-up. The monitor compares the window against
+reference distributions taken from the BRFSS dataset and reports PSI and
+chi-square per feature plus the most shifted feature pairs. Memory is fixed
+by the option counts and the number of buckets, whatever the traffic volume.
+
+Cells whose expected count in the window is below MIN_EXPECTED are pooled
+into one cell before PSI and chi-square are computed, and a feature or pair
+is only flagged when its chi-square p-value is also below P_VALUE_DRIFT
+(Bonferroni-corrected over the features and over the pairs). Without this, a few hundred
+in-distribution profiles spread over a pair's 100+ cells read as drift.
+
+Recording a profile is one vectorised numpy update under a lock. The
+comparison is computed at most once per report_interval, when metrics are
+read, so it stays off the request path.
+
+Build the reference distributions once:
+
+    python drift_monitor.py --data brfss2022_data_wrangling_output.zip
+"""
+import argparse
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from features import FEATURE_NAMES, FEATURE_OPTIONS, frame_codes, profile_codes
+
+REFERENCE_PATH = 'drift_reference.json'
+
+# PSI rule of thumb: < 0.1 stable, 0.1-0.2 moderate shift, > 0.2 significant shift
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.2
+# Cells expected to hold fewer observations are pooled, the usual chi-square validity rule
+MIN_EXPECTED = 5
+# Shifts are only reported when the chi-square test also rejects the reference distribution
+P_VALUE_DRIFT = 0.01
+
+PAIRS = list(itertools.combinations(range(len(FEATURE_NAMES)), 2))
+PAIR_NAMES = [f"{FEATURE_NAMES[i]}|{FEATURE_NAMES[j]}" for i, j in PAIRS]
+_PAIR_LEFT = np.array([i for i, _ in PAIRS])
+_PAIR_RIGHT = np.array([j for _, j in PAIRS])
+# Pair p's counters are cells _PAIR_OFFSETS[p]:_PAIR_OFFSETS[p + 1] of one flat array, laid out
+# as code_i * n_j + code_j like the reference lists
+_OPTION_COUNTS = np.array([len(FEATURE_OPTIONS[feature]) for feature in FEATURE_NAMES])
+_PAIR_SIZES = _OPTION_COUNTS[_PAIR_LEFT] * _OPTION_COUNTS[_PAIR_RIGHT]
+_PAIR_OFFSETS = np.concatenate([[0], np.cumsum(_PAIR_SIZES)])
+# Feature f's counters are cells _FEATURE_OFFSETS[f]:_FEATURE_OFFSETS[f + 1], indexed by option code
+_FEATURE_OFFSETS = np.concatenate([[0], np.cumsum(_OPTION_COUNTS)])
+
+
+def psi(expected, actual, eps=1e-4):
+    expected = np.asarray(expected, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    expected = np.maximum(expected / max(expected.sum(), 1), eps)
+    actual = np.maximum(actual / max(actual.sum(), 1), eps)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def chi_square(expected, actual):
+    from scipy.stats import chi2
+
+    expected = np.asarray(expected, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    mask = expected > 0
+    expected_counts = expected[mask] / expected.sum() * actual.sum()
+    statistic = float(np.sum((actual[mask] - expected_counts) ** 2 / expected_counts))
+    return statistic, float(chi2.sf(statistic, max(mask.sum() - 1, 1)))
+
+
+def pool_sparse(expected, actual, min_expected=MIN_EXPECTED):
+    """Merge the cells expected to hold fewer than min_expected observations into one.
+
+    Returns (expected, actual) with the kept cells first and the pooled cell last (dropped when
+    empty), or None when fewer than two cells remain and there is nothing to compare yet.
+    """
+    expected = np.asarray(expected, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    dense = expected / max(expected.sum(), 1) * actual.sum() >= min_expected
+    expected = np.append(expected[dense], expected[~dense].sum())
+    actual = np.append(actual[dense], actual[~dense].sum())
+    if expected[-1] == 0 and actual[-1] == 0:
+        expected, actual = expected[:-1], actual[:-1]
+    if len(expected) < 2:
+        return None
+    return expected, actual
+
+
+def compare(expected, actual, alpha=P_VALUE_DRIFT):
+    """PSI, chi-square and status of one distribution over its pooled cells, None if too sparse."""
+    pooled = pool_sparse(expected, actual)
+    if pooled is None:
+        return None
+    value = psi(*pooled)
+    statistic, p_value = chi_square(*pooled)
+    return {'psi': value, 'chi_square': statistic, 'p_value': p_value,
+            'status': _status(value) if p_value < alpha else 'stable'}
+
+
+def pair_cells(codes):
+    # Counter of every field pair's value combination, one distinct cell per pair (per row for 2-D codes)
+    return _PAIR_OFFSETS[:-1] + codes[..., _PAIR_LEFT] * _OPTION_COUNTS[_PAIR_RIGHT] + codes[..., _PAIR_RIGHT]
+
+
+def build_reference(data):
+    """Per-feature and per-pair option counts of the reference dataset."""
+    codes = frame_codes(data)
+    features = {feature: np.bincount(codes[:, j], minlength=len(FEATURE_OPTIONS[feature])).tolist()
+                for j, feature in enumerate(FEATURE_NAMES)}
+    counts = np.bincount(pair_cells(codes).ravel(), minlength=_PAIR_OFFSETS[-1])
+    pairs = {name: counts[_PAIR_OFFSETS[p]:_PAIR_OFFSETS[p + 1]].tolist() for p, name in enumerate(PAIR_NAMES)}
+    return {'rows': int(len(codes)), 'features': features, 'pairs': pairs}
+
+
+class DriftMonitor:
+    def __init__(self, reference=None, report_interval=60, top_pairs=5, window=3600, buckets=12):
+        self.reference = reference
+        self.report_interval = report_interval
+        self.top_pairs = top_pairs
+        self.window = window
+        # The window slides one bucket at a time: bucket b covers [b, b + 1) * bucket_seconds
+        self.bucket_seconds = window / buckets
+        self.bucket_ids = np.full(buckets, -1, dtype=np.int64)
+        self.counts = np.zeros((buckets, _FEATURE_OFFSETS[-1]), dtype=np.int64)
+        self.pair_counts = np.zeros((buckets, _PAIR_OFFSETS[-1]), dtype=np.int64)
+        self.observed = 0
+        self._lock = threading.Lock()
+        self._report = None
+        self._report_time = 0.0
+
+    @classmethod
+    def from_reference_file(cls, path=REFERENCE_PATH, **kwargs):
+        reference = None
+        if os.path.exists(path):
+            with open(path) as f:
+                reference = json.load(f)
+        return cls(reference, **kwargs)
+
+    def _bucket(self, now):
+        return int(now // self.bucket_seconds)
+
+    def observe(self, input_data):
+        codes = profile_codes(input_data)
+        cells = pair_cells(codes)
+        bucket = self._bucket(time.monotonic())
+        slot = bucket % len(self.bucket_ids)
+        with self._lock:
+            if self.bucket_ids[slot] != bucket:
+                # The slot still holds a bucket that has left the window
+                self.bucket_ids[slot] = bucket
+                self.counts[slot] = 0
+                self.pair_counts[slot] = 0
+            self.counts[slot, _FEATURE_OFFSETS[:-1] + codes] += 1
+            self.pair_counts[slot, cells] += 1
+            self.observed += 1
+
+    def report(self, force=False):
+        # Recomputed at most once per report_interval unless forced
+        now = time.monotonic()
+        if not force and self._report is not None and now - self._report_time < self.report_interval:
+            return self._report
+
+        with self._lock:
+            live = (self.bucket_ids >= 0) & (self.bucket_ids > self._bucket(now) - len(self.bucket_ids))
+            counts = self.counts[live].sum(axis=0)
+            pair_counts = self.pair_counts[live].sum(axis=0)
+            observed = self.observed
+        in_window = int(counts[:_FEATURE_OFFSETS[1]].sum())
+        report = {'observed': observed, 'window_seconds': self.window, 'window_observed': in_window,
+                  'reference_loaded': self.reference is not None}
+        if self.reference is None or not in_window:
+            self._report, self._report_time = report, now
+            return report
+
+        features = {}
+        for f, feature in enumerate(FEATURE_NAMES):
+            result = compare(self.reference['features'][feature],
+                             counts[_FEATURE_OFFSETS[f]:_FEATURE_OFFSETS[f + 1]],
+                             alpha=P_VALUE_DRIFT / len(FEATURE_NAMES))
+            if result is not None:
+                features[feature] = result
+
+        pairs = []
+        for p, name in enumerate(PAIR_NAMES):
+            result = compare(self.reference['pairs'][name], pair_counts[_PAIR_OFFSETS[p]:_PAIR_OFFSETS[p + 1]],
+                             alpha=P_VALUE_DRIFT / len(PAIR_NAMES))
+            if result is not None:
+                pairs.append(dict(pair=name, **result))
+        # Most significant first; PSI alone favours the pairs with the most cells
+        pairs.sort(key=lambda pair: (pair['p_value'], -pair['psi']))
+
+        report['features'] = features
+        report['max_feature_psi'] = max((f['psi'] for f in features.values()), default=0.0)
+        report['top_pairs'] = [{key: pair[key] for key in ('pair', 'psi', 'p_value', 'status')}
+                               for pair in pairs[:self.top_pairs]]
+        self._report, self._report_time = report, now
+        return report
+
+
+def _status(value):
+    if value > PSI_SIGNIFICANT:
+        return 'significant'
+    if value > PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+
+# Process-wide monitor shared by every session
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor():
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            import service_metrics
+
+            _monitor = DriftMonitor.from_reference_file()
+            service_metrics.register('input_drift', _monitor.report)
+        return _monitor
+
+
+if __name__ == '__main__':
+    from artifacts import DATA_PATH, load_reference_data
+
+    parser = argparse.ArgumentParser(description='Build reference distributions for the drift monitor.')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--output', default=REFERENCE_PATH)
+    args = parser.parse_args()
+
+    reference = build_reference(load_reference_data(args.data))
+    with open(args.output, 'w') as f:
+        json.dump(reference, f)
+    print(f"reference from {reference['rows']} rows written to {args.output} "
+          f"({len(reference['features'])} features, {len(reference['pairs'])} pairs)")
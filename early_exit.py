@@ -0,0 +1,128 @@
+"""Anytime prediction for the EasyEnsemble model.
+
+Members are evaluated one at a time and a row stops as soon as the running
+mean of member probabilities is confidently inside one risk band. Rows close
+to a band boundary keep going until every member has been evaluated, so the
+result only differs from predict_proba where the band is not in doubt.
+
+Offline evaluation on the reference dataset:
+
+    python early_exit.py --sample 20000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import risk_band_index
+
+
+def predict_proba_early_exit(model, X, min_members=4, z=2.0):
+    """Positive-class probability for each row of X and the number of members used.
+
+    A row stops once mean +/- z * standard error (with finite population
+    correction over the ensemble size) lies inside a single risk band.
+    """
+    X = np.asarray(X, dtype=float)
+    members = model.estimators_
+    members_features = model.estimators_features_
+    n_members = len(members)
+
+    totals = np.zeros(len(X))
+    totals_sq = np.zeros(len(X))
+    counts = np.zeros(len(X), dtype=int)
+    active = np.arange(len(X))
+
+    for i, (member, features) in enumerate(zip(members, members_features)):
+        proba = member.predict_proba(X[np.ix_(active, features)])[:, 1]
+        totals[active] += proba
+        totals_sq[active] += proba * proba
+        counts[active] += 1
+
+        evaluated = i + 1
+        if evaluated < min_members or evaluated == n_members:
+            continue
+        mean = totals[active] / evaluated
+        variance = np.maximum(totals_sq[active] / evaluated - mean * mean, 0)
+        correction = (n_members - evaluated) / (n_members - 1)
+        margin = z * np.sqrt(variance / evaluated * correction)
+        settled = risk_band_index((mean - margin) * 100) == risk_band_index((mean + margin) * 100)
+        active = active[~settled]
+        if not len(active):
+            break
+
+    return totals / counts, counts
+
+
+def predict_risk_early_exit(input_data, model, encoder, min_members=4, z=2.0):
+    # Single-profile counterpart of predict_heart_disease_risk in the apps
+    input_df = pd.DataFrame([input_data])
+    input_encoded = encoder.transform(input_df, y=None, override_return_df=False)
+    proba, counts = predict_proba_early_exit(model, input_encoded, min_members, z)
+    return proba[0] * 100, int(counts[0])
+
+
+def evaluate(model, encoder, data, min_members=4, z=2.0, batch_size=1):
+    """Compare early-exit against full predict_proba on the reference data.
+
+    batch_size=1 mirrors the apps, which score one profile per request.
+    """
+    from artifacts import split_features
+
+    X, _ = split_features(data)
+    X_encoded = np.asarray(encoder.transform(X, y=None, override_return_df=False), dtype=float)
+
+    full = np.empty(len(X_encoded))
+    fast = np.empty(len(X_encoded))
+    counts = np.empty(len(X_encoded), dtype=int)
+
+    start = time.perf_counter()
+    for i in range(0, len(X_encoded), batch_size):
+        full[i:i + batch_size] = model.predict_proba(X_encoded[i:i + batch_size])[:, 1]
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, len(X_encoded), batch_size):
+        fast[i:i + batch_size], counts[i:i + batch_size] = predict_proba_early_exit(
+            model, X_encoded[i:i + batch_size], min_members, z)
+    fast_time = time.perf_counter() - start
+
+    return {
+        'rows': len(X_encoded),
+        'members': len(model.estimators_),
+        'mean_members_evaluated': counts.mean(),
+        'band_agreement': np.mean(risk_band_index(full * 100) == risk_band_index(fast * 100)),
+        'mean_abs_error': np.abs(full - fast).mean() * 100,
+        'max_abs_error': np.abs(full - fast).max() * 100,
+        'full_seconds': full_time,
+        'early_exit_seconds': fast_time,
+        'speedup': full_time / fast_time,
+    }
+
+
+if __name__ == '__main__':
+    from artifacts import DATA_PATH, ENCODER_PATH, MODEL_PATH, load_encoder, load_model, load_reference_data
+
+    parser = argparse.ArgumentParser(description='Evaluate early-exit ensemble prediction on the reference dataset.')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--encoder', default=ENCODER_PATH)
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--sample', type=int, default=20000, help='number of reference rows to score')
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--min-members', type=int, default=4)
+    parser.add_argument('--z', type=float, nargs='+', default=[1.0, 2.0, 3.0],
+                        help='confidence multipliers to sweep')
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    encoder = load_encoder(args.encoder)
+    data = load_reference_data(args.data, sample=args.sample)
+
+    for z in args.z:
+        report = evaluate(model, encoder, data, args.min_members, z, args.batch_size)
+        print(f"z={z:.1f}: band agreement {report['band_agreement']:.4f}, "
+              f"members {report['mean_members_evaluated']:.1f}/{report['members']}, "
+              f"MAE {report['mean_abs_error']:.3f}%, max error {report['max_abs_error']:.3f}%, "
+              f"speedup {report['speedup']:.2f}x "
+              f"({report['full_seconds']:.2f}s -> {report['early_exit_seconds']:.2f}s on {report['rows']} rows)")
@@ -0,0 +1,185 @@
+"""Out-of-core, parallel evaluation of the model on the BRFSS dataset.
+
+The dataset is streamed in chunks and each chunk is scored in a worker
+process that loads the model and encoder once. Workers return fixed-size
+partial metrics (probability histograms per class, calibration sums and a
+band x outcome table) which are merged into one report, so peak memory is
+bounded by chunk size x chunks in flight, not by the dataset:
+
+    python evaluate.py --workers 4 --chunksize 50000 --json report.json
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+from features import BAND_NAMES, FEATURE_NAMES, risk_band_index
+
+# ROC AUC from histogram binning: resolution is 1 / N_AUC_BINS in probability
+N_AUC_BINS = 1000
+N_CALIBRATION_BINS = 10
+
+_worker_state = {}
+
+
+def _init_worker(model_path, encoder_path):
+    from artifacts import load_encoder, load_model
+
+    _worker_state['model'] = load_model(model_path)
+    _worker_state['encoder'] = load_encoder(encoder_path)
+
+
+def empty_metrics():
+    return {
+        'rows': 0,
+        'positives': np.zeros(N_AUC_BINS, dtype=np.int64),
+        'negatives': np.zeros(N_AUC_BINS, dtype=np.int64),
+        'calibration_count': np.zeros(N_CALIBRATION_BINS, dtype=np.int64),
+        'calibration_predicted': np.zeros(N_CALIBRATION_BINS),
+        'calibration_observed': np.zeros(N_CALIBRATION_BINS),
+        'band_outcome': np.zeros((len(BAND_NAMES), 2), dtype=np.int64),
+        'brier_sum': 0.0,
+        'log_loss_sum': 0.0,
+    }
+
+
+def chunk_metrics(proba, labels):
+    metrics = empty_metrics()
+    labels = np.asarray(labels, dtype=int)
+    metrics['rows'] = len(labels)
+
+    auc_bins = np.minimum((proba * N_AUC_BINS).astype(int), N_AUC_BINS - 1)
+    metrics['positives'] = np.bincount(auc_bins[labels == 1], minlength=N_AUC_BINS)
+    metrics['negatives'] = np.bincount(auc_bins[labels == 0], minlength=N_AUC_BINS)
+
+    calibration_bins = np.minimum((proba * N_CALIBRATION_BINS).astype(int), N_CALIBRATION_BINS - 1)
+    metrics['calibration_count'] = np.bincount(calibration_bins, minlength=N_CALIBRATION_BINS)
+    metrics['calibration_predicted'] = np.bincount(calibration_bins, weights=proba, minlength=N_CALIBRATION_BINS)
+    metrics['calibration_observed'] = np.bincount(calibration_bins, weights=labels, minlength=N_CALIBRATION_BINS)
+
+    bands = risk_band_index(proba * 100)
+    np.add.at(metrics['band_outcome'], (bands, labels), 1)
+
+    clipped = np.clip(proba, 1e-15, 1 - 1e-15)
+    metrics['brier_sum'] = float(np.sum((proba - labels) ** 2))
+    metrics['log_loss_sum'] = float(-np.sum(labels * np.log(clipped) + (1 - labels) * np.log(1 - clipped)))
+    return metrics
+
+
+def merge_metrics(total, part):
+    for key, value in part.items():
+        total[key] = total[key] + value
+    return total
+
+
+def _score_chunk(chunk):
+    model = _worker_state['model']
+    encoder = _worker_state['encoder']
+    labels = (chunk['heart_disease'] == 'yes').astype(int).values
+    encoded = encoder.transform(chunk[FEATURE_NAMES], y=None, override_return_df=False)
+    proba = model.predict_proba(encoded)[:, 1]
+    return chunk_metrics(proba, labels)
+
+
+def histogram_auc(positives, negatives):
+    # Walk bins from the highest score down; ties within a bin count half
+    positives = positives[::-1].astype(float)
+    negatives = negatives[::-1].astype(float)
+    positives_above = np.cumsum(positives) - positives
+    n_pos, n_neg = positives.sum(), negatives.sum()
+    if not n_pos or not n_neg:
+        return float('nan')
+    return float(np.sum(negatives * (positives_above + positives / 2)) / (n_pos * n_neg))
+
+
+def build_report(metrics):
+    rows = metrics['rows']
+    count = metrics['calibration_count']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        predicted = metrics['calibration_predicted'] / count
+        observed = metrics['calibration_observed'] / count
+    band_outcome = metrics['band_outcome']
+    return {
+        'rows': int(rows),
+        'prevalence': float(metrics['positives'].sum() / rows) if rows else float('nan'),
+        'roc_auc': histogram_auc(metrics['positives'], metrics['negatives']),
+        'brier_score': metrics['brier_sum'] / rows if rows else float('nan'),
+        'log_loss': metrics['log_loss_sum'] / rows if rows else float('nan'),
+        'calibration': [
+            {'bin': f"{i / N_CALIBRATION_BINS:.1f}-{(i + 1) / N_CALIBRATION_BINS:.1f}",
+             'count': int(count[i]),
+             'mean_predicted': None if not count[i] else float(predicted[i]),
+             'observed_rate': None if not count[i] else float(observed[i])}
+            for i in range(N_CALIBRATION_BINS)
+        ],
+        'band_confusion': {
+            name: {'no_heart_disease': int(band_outcome[i, 0]), 'heart_disease': int(band_outcome[i, 1])}
+            for i, name in enumerate(BAND_NAMES)
+        },
+    }
+
+
+def evaluate(data_path, model_path, encoder_path, workers=4, chunksize=50000):
+    """Stream data_path in chunks, score them across worker processes and merge the metrics."""
+    reader = pd.read_csv(data_path, compression='zip', chunksize=chunksize,
+                         usecols=FEATURE_NAMES + ['heart_disease'])
+    total = empty_metrics()
+    # At most two chunks per worker are read ahead, which bounds memory
+    max_in_flight = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, encoder_path)) as executor:
+        pending = set()
+        for chunk in reader:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    merge_metrics(total, future.result())
+            pending.add(executor.submit(_score_chunk, chunk))
+        for future in pending:
+            merge_metrics(total, future.result())
+    return build_report(total)
+
+
+def _peak_rss_mb():
+    import resource
+
+    self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return self_kb / 1024, children_kb / 1024
+
+
+if __name__ == '__main__':
+    from artifacts import DATA_PATH, ENCODER_PATH, MODEL_PATH
+
+    parser = argparse.ArgumentParser(description='Evaluate the model on the BRFSS dataset out of core.')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--encoder', default=ENCODER_PATH)
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunksize', type=int, default=50000)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = evaluate(args.data, args.model, args.encoder, args.workers, args.chunksize)
+    elapsed = time.perf_counter() - start
+    main_mb, worker_mb = _peak_rss_mb()
+
+    print(f"rows: {report['rows']}  prevalence: {report['prevalence']:.4f}")
+    print(f"ROC AUC: {report['roc_auc']:.4f}  Brier: {report['brier_score']:.4f}  log loss: {report['log_loss']:.4f}")
+    print("calibration (mean predicted -> observed rate):")
+    for row in report['calibration']:
+        if row['count']:
+            print(f"  {row['bin']}: {row['mean_predicted']:.3f} -> {row['observed_rate']:.3f} (n={row['count']})")
+    print("band confusion (band: no heart disease / heart disease):")
+    for name, counts in report['band_confusion'].items():
+        print(f"  {name}: {counts['no_heart_disease']} / {counts['heart_disease']}")
+    print(f"elapsed {elapsed:.1f}s ({report['rows'] / elapsed:.0f} rows/s), "
+          f"peak RSS main {main_mb:.0f} MB, largest worker {worker_mb:.0f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
@@ -0,0 +1,186 @@
+# Shared description of the 22-field assessment profile used by both apps.
+# The order matches the `input_data` dict built in app.py / heart_app2.py,
+# which is also the column order the encoder and model were fitted on.
+import numpy as np
+import pandas as pd
+
+FEATURE_OPTIONS = {
+    'gender': ["female", "male", "nonbinary"],
+    'race': [
+        "white_only_non_hispanic", "black_only_non_hispanic", "asian_only_non_hispanic",
+        "american_indian_or_alaskan_native_only_non_hispanic", "multiracial_non_hispanic",
+        "hispanic", "native_hawaiian_or_other_pacific_islander_only_non_hispanic"
+    ],
+    'general_health': ["excellent", "very_good", "good", "fair", "poor"],
+    'health_care_provider': ["yes_only_one", "more_than_one", "no"],
+    'could_not_afford_to_see_doctor': ["yes", "no"],
+    'length_of_time_since_last_routine_checkup': ["past_year", "past_2_years", "past_5_years", "5+_years_ago", "never"],
+    'ever_diagnosed_with_heart_attack': ["yes", "no"],
+    'ever_diagnosed_with_a_stroke': ["yes", "no"],
+    'ever_told_you_had_a_depressive_disorder': ["yes", "no"],
+    'ever_told_you_have_kidney_disease': ["yes", "no"],
+    'ever_told_you_had_diabetes': ["yes", "no", "no_prediabetes", "yes_during_pregnancy"],
+    'BMI': [
+        "underweight_bmi_less_than_18_5", "normal_weight_bmi_18_5_to_24_9", "overweight_bmi_25_to_29_9",
+        "obese_bmi_30_or_more"
+    ],
+    'difficulty_walking_or_climbing_stairs': ["yes", "no"],
+    'physical_health_status': ["zero_days_not_good", "1_to_13_days_not_good", "14_plus_days_not_good"],
+    'mental_health_status': ["zero_days_not_good", "1_to_13_days_not_good", "14_plus_days_not_good"],
+    'asthma_Status': ["never_asthma", "current_asthma", "former_asthma"],
+    'smoking_status': ["never_smoked", "former_smoker", "current_smoker_some_days", "current_smoker_every_day"],
+    'binge_drinking_status': ["yes", "no"],
+    'exercise_status_in_past_30_Days': ["yes", "no"],
+    'age_category': [
+        "Age_18_to_24", "Age_25_to_29", "Age_30_to_34", "Age_35_to_39",
+        "Age_40_to_44", "Age_45_to_49", "Age_50_to_54", "Age_55_to_59",
+        "Age_60_to_64", "Age_65_to_69", "Age_70_to_74", "Age_75_to_79",
+        "Age_80_or_older"
+    ],
+    'sleep_category': [
+        "very_short_sleep_0_to_3_hours", "short_sleep_4_to_5_hours", "normal_sleep_6_to_8_hours",
+        "long_sleep_9_to_10_hours", "very_long_sleep_11_or_more_hours"
+    ],
+    'drinks_category': [
+        "did_not_drink", "very_low_consumption_0.01_to_1_drinks", "low_consumption_1.01_to_5_drinks",
+        "moderate_consumption_5.01_to_10_drinks", "high_consumption_10.01_to_20_drinks",
+        "very_high_consumption_more_than_20_drinks"
+    ],
+}
+
+FEATURE_NAMES = list(FEATURE_OPTIONS)
+
+# Position of each option within its field, used to turn profiles into small integer codes
+OPTION_CODES = {feature: {option: code for code, option in enumerate(options)}
+                for feature, options in FEATURE_OPTIONS.items()}
+
+# Fields a user can realistically change through lifestyle
+MODIFIABLE_FEATURES = [
+    'smoking_status',
+    'drinks_category',
+    'binge_drinking_status',
+    'exercise_status_in_past_30_Days',
+    'sleep_category',
+    'BMI',
+]
+
+# User-friendly names, same wording as the contribution chart in app.py
+FEATURE_LABELS = {
+    'gender': 'Gender',
+    'race': 'Race/Ethnicity',
+    'general_health': 'General Health',
+    'health_care_provider': 'Healthcare Provider',
+    'could_not_afford_to_see_doctor': 'Doctor Access',
+    'length_of_time_since_last_routine_checkup': 'Checkup Time',
+    'ever_diagnosed_with_heart_attack': 'Heart Attack',
+    'ever_diagnosed_with_a_stroke': 'Stroke',
+    'ever_told_you_had_a_depressive_disorder': 'Depression',
+    'ever_told_you_have_kidney_disease': 'Kidney Disease',
+    'ever_told_you_had_diabetes': 'Diabetes',
+    'BMI': 'BMI',
+    'difficulty_walking_or_climbing_stairs': 'Mobility',
+    'physical_health_status': 'Physical Health',
+    'mental_health_status': 'Mental Health',
+    'asthma_Status': 'Asthma',
+    'smoking_status': 'Smoking',
+    'binge_drinking_status': 'Binge Drinking',
+    'exercise_status_in_past_30_Days': 'Exercise',
+    'age_category': 'Age',
+    'sleep_category': 'Sleep',
+    'drinks_category': 'Alcohol',
+}
+
+# Risk band thresholds (in %) used for the results card and recommendations
+RISK_BANDS = [(70, 'Very High Risk'), (40, 'High Risk'), (25, 'Moderate Risk')]
+LOW_RISK = 'Low Risk'
+
+# Band names from lowest to highest, indexed by risk_band_index
+BAND_NAMES = [LOW_RISK] + [name for _, name in reversed(RISK_BANDS)]
+BAND_EDGES = sorted(threshold for threshold, _ in RISK_BANDS)
+
+
+def risk_band_index(risk):
+    # Vectorised band lookup for arrays of risks in %, consistent with risk_band
+    return np.searchsorted(BAND_EDGES, risk, side='left')
+
+
+def risk_band(risk):
+    for threshold, name in RISK_BANDS:
+        if risk > threshold:
+            return name
+    return LOW_RISK
+
+
+def profile_codes(input_data):
+    # Option code of every field of one profile, in FEATURE_NAMES order
+    return np.array([OPTION_CODES[feature][input_data[feature]] for feature in FEATURE_NAMES], dtype=np.int64)
+
+
+def frame_codes(df):
+    """Option codes for every row of a DataFrame with the 22 profile columns.
+
+    Raises ValueError on values that are not one of the app's options.
+    """
+    codes = np.empty((len(df), len(FEATURE_NAMES)), dtype=np.int64)
+    for j, feature in enumerate(FEATURE_NAMES):
+        codes[:, j] = pd.Categorical(df[feature], categories=FEATURE_OPTIONS[feature]).codes
+        if (codes[:, j] < 0).any():
+            unknown = sorted(set(df[feature][codes[:, j] < 0].astype(str)))
+            raise ValueError(f"Unknown values for {feature}: {unknown[:5]}")
+    return codes
+
+
+# Bits per field when a profile is packed into one 64-bit integer (43 bits in total)
+FEATURE_BITS = [max(1, (len(FEATURE_OPTIONS[feature]) - 1).bit_length()) for feature in FEATURE_NAMES]
+FEATURE_SHIFTS = np.concatenate([[0], np.cumsum(FEATURE_BITS)[:-1]]).astype(np.uint64)
+
+
+def pack_codes(codes):
+    # (n, 22) option codes -> (n,) uint64, first field in the lowest bits
+    codes = np.asarray(codes, dtype=np.uint64)
+    return np.bitwise_or.reduce(codes << FEATURE_SHIFTS, axis=-1)
+
+
+def unpack_codes(packed):
+    packed = np.asarray(packed, dtype=np.uint64)
+    masks = np.array([(1 << bits) - 1 for bits in FEATURE_BITS], dtype=np.uint64)
+    return ((packed[..., None] >> FEATURE_SHIFTS) & masks).astype(np.int64)
+
+
+def pack_profile(input_data):
+    return int(pack_codes(profile_codes(input_data)))
+
+
+def unpack_profile(packed):
+    codes = unpack_codes(np.uint64(packed))
+    return {feature: FEATURE_OPTIONS[feature][code] for feature, code in zip(FEATURE_NAMES, codes)}
+
+
+def codes_to_frame(codes):
+    # Inverse of frame_codes, with categorical columns
+    return pd.DataFrame({
+        feature: pd.Categorical.from_codes(codes[:, j], categories=FEATURE_OPTIONS[feature])
+        for j, feature in enumerate(FEATURE_NAMES)
+    })
+
+
+def compile_encoder(encoder):
+    """Encoded value of every option of every field as a (22, max options) table.
+
+    The encoder maps each field independently, so transforming one frame that
+    cycles through all options gives every table entry in a single call. Use
+    encode_codes to apply the table.
+    """
+    max_options = max(len(options) for options in FEATURE_OPTIONS.values())
+    grid = pd.DataFrame({feature: [options[i % len(options)] for i in range(max_options)]
+                         for feature, options in FEATURE_OPTIONS.items()})
+    encoded = np.asarray(encoder.transform(grid, y=None, override_return_df=False), dtype=np.float64)
+    tables = np.zeros((len(FEATURE_NAMES), max_options))
+    for j, options in enumerate(FEATURE_OPTIONS.values()):
+        tables[j, :len(options)] = encoded[:len(options), j]
+    return tables
+
+
+def encode_codes(tables, codes):
+    # Same values as encoder.transform, from option codes and compile_encoder tables
+    return tables[np.arange(len(FEATURE_NAMES)), codes]
@@ -1,22 +1,66 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import pickle as pkl
-from PIL import Image
 import io
+import os
 from lightgbm import LGBMClassifier
 import category_encoders as ce
 from imblearn.ensemble import EasyEnsembleClassifier
 import shap
 import plotly.express as px
 import plotly.graph_objects as go
-
-# Load the pickled model and encoder
-with open('best_model.pkl', 'rb') as model_file:
-    model = pkl.load(model_file)
-
-with open('cbe_encoder.pkl', 'rb') as encoder_file:
-    encoder = pkl.load(encoder_file)
+from whatif import what_if_sweep, optimize_lifestyle
+from features import FEATURE_LABELS
+from early_exit import predict_risk_early_exit
+from artifacts import load_encoder, load_model, load_scoring_model, model_version
+from drift_monitor import get_monitor
+from audit_log import get_audit_log
+from model_registry import get_registry
+from inference_executor import get_executor
+from rescoring import get_rescorer
+from similar_patients import DISTANCE_LABELS, get_similar_index
+from result_cache import get_result_cache
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from static_assets import static_markup, style_tag
+import service_metrics
+
+# Optional anytime mode: stop evaluating ensemble members once the risk band is settled
+EARLY_EXIT = os.environ.get('HEART_EARLY_EXIT') == '1'
+
+# Model and SHAP calls run on bounded worker slots shared by all sessions, queued fairly per session
+inference = get_executor()
+
+
+@st.cache_resource(show_spinner=False)
+def load_artifacts(version):
+    # Unpickled once per process and model version and shared by every session and rerun.
+    # Risk scores come from the full ensemble or the distilled fast tier (HEART_MODEL_TIER=distilled);
+    # SHAP explanations always use the full ensemble.
+    model = load_model()
+    encoder = load_encoder()
+    scoring_model = load_scoring_model(model)
+    inference.limit_threads(model)
+    inference.limit_threads(scoring_model)
+    # Re-assessments only re-evaluate the trees that split on fields changed since the session's last one
+    return model, encoder, scoring_model, get_rescorer(scoring_model, encoder)
+
+# Process-wide monitor of incoming profiles against the BRFSS reference distributions
+drift_monitor = get_monitor()
+
+# Append-only audit log of every assessment
+audit_log = get_audit_log()
+MODEL_VERSION = model_version()
+model, encoder, scoring_model, rescorer = load_artifacts(MODEL_VERSION)
+
+# Optional multi-version registry (HEART_MODEL_REGISTRY=models): sessions are routed to versions by sticky hash
+model_registry = get_registry()
+
+# Index of BRFSS respondents by profile, if built with similar_patients.py
+similar_index = get_similar_index()
+
+# Results shared across processes and restarts (HEART_RESULT_CACHE=path). Only the default scoring
+# path uses it, since only there a result depends on nothing but the profile and MODEL_VERSION.
+result_cache = get_result_cache() if not EARLY_EXIT and model_registry is None else None
 
 # Load the dataset for reference
 data = pd.read_csv('brfss2022_data_wrangling_output.zip', compression='zip')
@@ -30,10 +74,8 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Custom CSS with HoloMed AI styling
-def local_css():
-    st.markdown("""
-    <style>
+# Custom CSS with HoloMed AI styling, minified once per process by style_tag
+HOLOMED_CSS = """
     /* Import Google Fonts */
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
     
@@ -302,22 +344,24 @@ def local_css():
         margin: 0.2rem;
         font-weight: 500;
     }
-    </style>
-    """, unsafe_allow_html=True)
+"""
+
+def local_css():
+    st.markdown(style_tag(HOLOMED_CSS), unsafe_allow_html=True)
 
 local_css()
 
 # Header Section
-st.markdown("""
+st.markdown(static_markup("""
 <div class="holomedai-header">
     <h1 class="holomedai-title">HoloMed AI</h1>
     <p class="holomedai-subtitle">AI-Powered Heart Disease Risk Assessment</p>
     <p class="holomedai-mission">Providing accessible education on the transformative impact of AI in Medicine</p>
 </div>
-""", unsafe_allow_html=True)
+"""), unsafe_allow_html=True)
 
 # Technology badges
-st.markdown("""
+st.markdown(static_markup("""
 <div style="text-align: center; margin: 2rem 0;">
     <span class="tech-badge">🤖 Machine Learning</span>
     <span class="tech-badge">📊 SHAP Analysis</span>
@@ -325,21 +369,21 @@ st.markdown("""
     <span class="tech-badge">⚡ Real-time Prediction</span>
     <span class="tech-badge">🔬 Evidence-Based</span>
 </div>
-""", unsafe_allow_html=True)
+"""), unsafe_allow_html=True)
 
 # Info Cards
 col1, col2 = st.columns(2)
 
 with col1:
-    st.markdown("""
+    st.markdown(static_markup("""
     <div class="info-card">
         <h3>Our Mission</h3>
         <p>HoloMed AI leverages cutting-edge artificial intelligence to provide personalized cardiovascular risk assessments. Our advanced models analyze multiple health factors to deliver actionable insights that empower you to take control of your heart health.</p>
     </div>
-    """, unsafe_allow_html=True)
+    """), unsafe_allow_html=True)
 
 with col2:
-    st.markdown("""
+    st.markdown(static_markup("""
     <div class="info-card">
         <h3>How It Works</h3>
         <ul>
@@ -349,7 +393,7 @@ with col2:
             <li><strong>Smart Recommendations:</strong> Get AI-powered actionable advice</li>
         </ul>
     </div>
-    """, unsafe_allow_html=True)
+    """), unsafe_allow_html=True)
 
 st.markdown("---")
 
@@ -469,7 +513,31 @@ st.markdown("""
 
 if st.button('🚀 Get AI-Powered Risk Assessment', key='assessment_btn'):
     try:
-        risk = predict_heart_disease_risk(input_data, model, encoder)
+        session_id = get_script_run_ctx().session_id
+        # With the registry, every model call of this session (risk, SHAP, what-if, plans) uses its routed version
+        if model_registry is not None:
+            assessed_version = model_registry.route(session_id)
+            session_model = session_scoring_model = model_registry.get(assessed_version)
+        else:
+            assessed_version = MODEL_VERSION
+            session_model, session_scoring_model = model, scoring_model
+        cached = result_cache.get(input_data, MODEL_VERSION) if result_cache is not None else None
+        if cached is not None:
+            risk = cached[0]
+        elif EARLY_EXIT:
+            risk, members_evaluated = inference.run(session_id, predict_risk_early_exit, input_data, session_model, encoder)
+            st.caption(f"Early-exit mode: evaluated {members_evaluated} of {len(session_model.estimators_)} ensemble members")
+        elif model_registry is not None:
+            risk, _ = inference.run(session_id, model_registry.predict_risk, input_data, encoder,
+                                    version=assessed_version)
+        elif rescorer is not None:
+            scored = inference.run(session_id, rescorer.score, input_data, st.session_state.get('scored_profile'))
+            st.session_state['scored_profile'] = scored
+            risk = scored.risk
+        else:
+            risk = inference.run(session_id, predict_heart_disease_risk, input_data, scoring_model, encoder)
+        drift_monitor.observe(input_data)
+        audit_log.record(input_data, risk, assessed_version)
         
         # Determine risk level and styling
         if risk > 70:
@@ -499,7 +567,16 @@ if st.button('🚀 Get AI-Powered Risk Assessment', key='assessment_btn'):
             </div>
         </div>
         """, unsafe_allow_html=True)
-        
+
+        # Observed outcomes of the survey respondents with the most similar answers
+        if similar_index is not None:
+            similar = similar_index.summary(input_data)
+            st.markdown("#### 👥 People With Answers Like Yours")
+            if similar.empty:
+                st.markdown("No survey respondents gave answers within two questions of yours.")
+            for row in similar.itertuples():
+                st.markdown(f"- {DISTANCE_LABELS[row.Distance]}: {row.Respondents} respondents, {row.Rate:.1f}% had heart disease")
+
         # SHAP Analysis and Recommendations
         col1, col2 = st.columns([1, 1])
         
@@ -507,10 +584,19 @@ if st.button('🚀 Get AI-Powered Risk Assessment', key='assessment_btn'):
             # Generate SHAP values and feature importance
             input_df = pd.DataFrame([input_data])
             input_encoded = encoder.transform(input_df, y=None, override_return_df=False)
-            lgbm_model = model.estimators_[0].steps[-1][1]
-            explainer = shap.TreeExplainer(lgbm_model)
-            shap_values = explainer.shap_values(input_encoded)
-            feature_importances = np.abs(shap_values[1]).sum(axis=0)
+            if cached is not None and cached[1] is not None:
+                shap_array = cached[1][None, :]
+            else:
+                lgbm_model = session_model.estimators_[0].steps[-1][1]
+                explainer = shap.TreeExplainer(lgbm_model)
+                shap_values = inference.run(session_id, explainer.shap_values, input_encoded)
+                try:
+                    shap_array = shap_values[1]
+                except IndexError:
+                    shap_array = shap_values
+                if result_cache is not None:
+                    result_cache.put(input_data, MODEL_VERSION, risk, np.asarray(shap_array)[0])
+            feature_importances = np.abs(shap_array).sum(axis=0)
             feature_importances /= feature_importances.sum()
             feature_importances *= 100
             feature_importance_df = pd.DataFrame({
@@ -630,22 +716,57 @@ if st.button('🚀 Get AI-Powered Risk Assessment', key='assessment_btn'):
             
             st.markdown("</div>", unsafe_allow_html=True)
 
+        # What-if panel: every single-field alternative scored in one batch
+        _, sweep_df = inference.run(session_id, what_if_sweep, input_data, session_scoring_model, encoder,
+                                    base=st.session_state.get('scored_profile'))
+        st.markdown("#### 🔄 What If You Changed One Thing?")
+        lifestyle_df = sweep_df[sweep_df['Modifiable'] & sweep_df['Healthier']]
+        st.dataframe(
+            lifestyle_df[['Factor', 'Option', 'Risk', 'Delta']].style.format({'Risk': '{:.1f}%', 'Delta': '{:+.1f}%'}),
+            hide_index=True,
+            use_container_width=True
+        )
+        with st.expander("All factors"):
+            st.dataframe(
+                sweep_df[['Factor', 'Option', 'Risk', 'Delta']].style.format({'Risk': '{:.1f}%', 'Delta': '{:+.1f}%'}),
+                hide_index=True,
+                use_container_width=True
+            )
+
+        # Smallest combinations of lifestyle changes that reach the low risk band
+        if risk > 25:
+            st.markdown("#### 🎯 Smallest Lifestyle Changes to Reach Low Risk")
+            plans = inference.run(session_id, optimize_lifestyle, input_data, session_scoring_model, encoder,
+                                  target=25, version=assessed_version)
+            if not plans:
+                st.markdown("None of your lifestyle answers has a healthier option that lowers your predicted risk.")
+            elif not plans[0]['reaches_target']:
+                st.markdown("No combination of lifestyle changes brings your risk below 25%. These come closest:")
+            for plan in plans:
+                changes = "<br>".join(f"{FEATURE_LABELS[feature]}: {input_data[feature]} → {option}" for feature, option in plan['changes'].items())
+                st.markdown(f"""
+                <div class="recommendation">
+                    <strong>{len(plan['changes'])} change(s) → {plan['risk']:.1f}% risk</strong><br>
+                    {changes}
+                </div>
+                """, unsafe_allow_html=True)
+
     except Exception as e:
         st.error(f"An error occurred: {e}")
 
 st.markdown("</div>", unsafe_allow_html=True)
 
 # Disclaimer
-st.markdown("""
+st.markdown(static_markup("""
 <div class="disclaimer">
     <h4>⚠️ Medical Disclaimer</h4>
     <p>This AI-powered assessment is for educational purposes only and is not a substitute for professional medical advice, diagnosis, or treatment. Always consult with qualified healthcare providers regarding your health concerns.</p>
 </div>
-""", unsafe_allow_html=True)
+"""), unsafe_allow_html=True)
 
 # Contact Section
 with st.expander("💬 Connect with HoloMed AI"):
-    st.markdown("""
+    st.markdown(static_markup("""
     <div class="contact-form">
         <form action="https://formsubmit.co/your-email@domain.com" method="POST">
             <input type="hidden" name="_captcha" value="false">
@@ -655,10 +776,10 @@ with st.expander("💬 Connect with HoloMed AI"):
             <button type="submit">Send Message</button>
         </form>
     </div>
-    """, unsafe_allow_html=True)
+    """), unsafe_allow_html=True)
 
 # Footer
-st.markdown("""
+st.markdown(static_markup("""
 <div class="holomedai-footer">
     <h4>🌐 Follow HoloMed AI</h4>
     <div class="social-links">
@@ -674,4 +795,9 @@ st.markdown("""
         Providing accessible education on the transformative impact of AI in Medicine
     </p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+"""), unsafe_allow_html=True)
+
+# Service metrics for operators (HEART_SERVICE_METRICS=1)
+if service_metrics.ENABLED:
+    with st.sidebar.expander("Service metrics"):
+        st.json(service_metrics.snapshot())
@@ -0,0 +1,153 @@
+"""Process-wide bounded executor for model and SHAP calls.
+
+Streamlit runs every session's script in its own thread, and each LightGBM
+predict or SHAP call would otherwise start a full OpenMP thread pool. With
+several sessions at once that oversubscribes the CPU and tail latency blows
+up. Here every call runs on one of a fixed set of worker threads:
+
+- the thread budget (HEART_THREAD_BUDGET, default: all cores) is split into
+  thread_budget // call_threads slots, one worker thread per slot;
+- each call may use call_threads native threads (HEART_CALL_THREADS,
+  default 1), set through threadpoolctl and the members' n_jobs;
+- waiting calls are queued per session and the sessions are served round
+  robin, so one session's sweep cannot starve another's assessment.
+
+Queue wait and run time percentiles go to the service metrics.
+HEART_INFERENCE_EXECUTOR=0 runs calls inline in the session thread (the old
+behaviour) for comparison with loadtest.py --executor off.
+
+Calls must not submit further calls to the executor, or they can deadlock
+once every slot is waiting.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+ENABLED = os.environ.get('HEART_INFERENCE_EXECUTOR', '1') != '0'
+THREAD_BUDGET = int(os.environ.get('HEART_THREAD_BUDGET', os.cpu_count() or 1))
+CALL_THREADS = int(os.environ.get('HEART_CALL_THREADS', 1))
+LATENCY_WINDOW = 1000
+
+
+def _percentile_ms(values, q):
+    return float(np.percentile(np.array(values) * 1000, q)) if values else None
+
+
+class InferenceExecutor:
+    def __init__(self, thread_budget=THREAD_BUDGET, call_threads=CALL_THREADS, enabled=ENABLED):
+        self.enabled = enabled
+        self.call_threads = max(1, min(call_threads, thread_budget))
+        self.slots = max(1, thread_budget // self.call_threads)
+        self._queues = OrderedDict()  # session -> deque of jobs, in round-robin order
+        self._cond = threading.Condition()
+        self._active = 0
+        self._completed = 0
+        self._waits = deque(maxlen=LATENCY_WINDOW)
+        self._runs = deque(maxlen=LATENCY_WINDOW)
+        if enabled:
+            for i in range(self.slots):
+                threading.Thread(target=self._work, name=f'inference-{i}', daemon=True).start()
+
+    def run(self, session, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) on a worker slot, queued fairly under session; returns its result."""
+        if not self.enabled:
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._record(0.0, time.perf_counter() - start)
+        future = Future()
+        with self._cond:
+            self._queues.setdefault(session, deque()).append((future, fn, args, kwargs, time.perf_counter()))
+            self._cond.notify()
+        return future.result()
+
+    def limit_threads(self, model):
+        # LightGBM passes n_jobs to every predict call, which would override the OpenMP limit
+        if not self.enabled:
+            return
+        for member in getattr(model, 'estimators_', [model]):
+            estimator = member.steps[-1][1] if hasattr(member, 'steps') else member
+            # The distilled tier wraps its LightGBM regressor
+            estimator = getattr(estimator, 'regressor', estimator)
+            if hasattr(estimator, 'get_params') and 'n_jobs' in estimator.get_params():
+                estimator.set_params(n_jobs=self.call_threads)
+
+    def _next_job(self):
+        # Called under self._cond: head of the first session, which then moves to the back
+        session, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        if queue:
+            self._queues.move_to_end(session)
+        else:
+            del self._queues[session]
+        return job
+
+    def _work(self):
+        from threadpoolctl import threadpool_limits
+
+        # The OpenMP limit applies to the calling thread, so set it once per worker
+        threadpool_limits(limits=self.call_threads)
+        while True:
+            with self._cond:
+                while not self._queues:
+                    self._cond.wait()
+                future, fn, args, kwargs, queued_at = self._next_job()
+                self._active += 1
+            started = time.perf_counter()
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            finished = time.perf_counter()
+            with self._cond:
+                self._active -= 1
+            self._record(started - queued_at, finished - started)
+
+    def _record(self, wait, run):
+        with self._cond:
+            self._completed += 1
+            self._waits.append(wait)
+            self._runs.append(run)
+
+    def stats(self):
+        with self._cond:
+            waits = list(self._waits)
+            runs = list(self._runs)
+            return {
+                'enabled': self.enabled,
+                'slots': self.slots,
+                'call_threads': self.call_threads,
+                'active': self._active,
+                'queued': sum(len(queue) for queue in self._queues.values()),
+                'waiting_sessions': len(self._queues),
+                'completed': self._completed,
+                'wait_p50_ms': _percentile_ms(waits, 50),
+                'wait_p95_ms': _percentile_ms(waits, 95),
+                'wait_p99_ms': _percentile_ms(waits, 99),
+                'run_p50_ms': _percentile_ms(runs, 50),
+                'run_p95_ms': _percentile_ms(runs, 95),
+            }
+
+
+# Process-wide executor shared by every session
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            import service_metrics
+
+            _executor = InferenceExecutor()
+            service_metrics.register('inference_executor', _executor.stats)
+        return _executor
@@ -0,0 +1,318 @@
+"""Local concurrency load test for the Streamlit front ends, no browser needed.
+
+The app runs as one real `streamlit run` server process, started fresh for
+every concurrency level. Each simulated user is a headless websocket client
+that speaks Streamlit's protobuf protocol, like a browser tab, and loops
+through the full flow: open a new session, pick a random option in every
+selectbox, click the assessment button and wait for the rerun that renders
+the results. A flow only counts if the page shows a risk value.
+
+So all sessions share one process, as in production: one copy of the model
+and the st.cache_resource artifacts, one inference executor, one GIL. Each
+connection is its own server-side session, so the executor's per-session
+fair queue sees every user.
+
+For each concurrency level it reports throughput, assessment latency
+percentiles, and the server's CPU use and resident memory (read from /proc,
+so Linux only). The queue wait p95 is the server's own inference_executor
+metric (HEART_SERVICE_METRICS), read at the end of the level:
+
+    python loadtest.py app.py --levels 1 2 4 8 16 --duration 30
+
+--payload instead reports the bytes of rendered elements sent per rerun.
+
+--executor off starts the server with HEART_INFERENCE_EXECUTOR=0, so model
+and SHAP calls run inline in the session threads instead of on the shared
+inference executor, to compare the two:
+
+    python loadtest.py app.py --levels 1 8 32 --executor on
+    python loadtest.py app.py --levels 1 8 32 --executor off
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+
+# How app.py and heart_app2.py render the assessed risk
+RISK_PATTERNS = [re.compile(r'Predicted Heart Disease Risk: (\d+\.\d+)%'), re.compile(r'(\d+\.\d+)% Risk')]
+
+
+def rendered_risk(texts):
+    """Risk in % in the rendered markdown texts of an assessment, or None if none is rendered."""
+    for text in texts:
+        for pattern in RISK_PATTERNS:
+            match = pattern.search(text)
+            if match and 0 <= float(match.group(1)) <= 100:
+                return float(match.group(1))
+    return None
+
+
+def _process_usage(pid):
+    # (CPU seconds, resident MB) of a process from /proc
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return float('nan'), float('nan')
+    # utime and stime are fields 14 and 15 of stat, counted after the command name
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK'), rss
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(script_path, executor, timeout=120):
+    """Start `streamlit run` on a free local port; returns (process, port) once it is healthy."""
+    port = _free_port()
+    env = dict(os.environ, HEART_INFERENCE_EXECUTOR='1' if executor else '0', HEART_SERVICE_METRICS='1')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', script_path, '--server.headless=true',
+         f'--server.port={port}', '--server.address=127.0.0.1', '--server.fileWatcherType=none',
+         '--browser.gatherUsageStats=false'],
+        env=env, cwd=os.path.dirname(script_path), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {server.returncode}")
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return server, port
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("streamlit server did not become healthy")
+
+
+class Session:
+    """One browser-like session on the server: a websocket speaking Streamlit's BackMsg/ForwardMsg."""
+
+    def __init__(self, port, timeout):
+        self.url = f'ws://127.0.0.1:{port}/_stcore/stream'
+        self.timeout = timeout
+        self.selectboxes = {}  # widget id -> options, in page order
+        self.button = None
+        self.markdown = []
+        self.json = []
+        self.errors = []
+
+    async def __aenter__(self):
+        import websockets
+
+        self.connection = await websockets.connect(self.url, max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.connection.close()
+
+    async def rerun(self, selections=None, click=False):
+        """Rerun the script with the given selectbox indices (and the button clicked); returns seconds."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.Selectbox_pb2 import Selectbox
+
+        # Newer Streamlit versions send a selectbox's option text, older ones its index
+        by_text = 'raw_value' in Selectbox.DESCRIPTOR.fields_by_name
+        message = BackMsg()
+        message.rerun_script.query_string = ''
+        for widget_id, index in (selections or {}).items():
+            widget = message.rerun_script.widget_states.widgets.add()
+            widget.id = widget_id
+            if by_text:
+                widget.string_value = self.selectboxes[widget_id][index]
+            else:
+                widget.int_value = index
+        if click:
+            widget = message.rerun_script.widget_states.widgets.add()
+            widget.id = self.button
+            widget.trigger_value = True
+
+        self.markdown, self.json, self.errors = [], [], []
+        start = time.perf_counter()
+        await self.connection.send(message.SerializeToString())
+        await asyncio.wait_for(self._read_run(), self.timeout)
+        return time.perf_counter() - start
+
+    async def _read_run(self):
+        from streamlit.proto.Alert_pb2 import Alert
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        while True:
+            data = await self.connection.recv()
+            message = ForwardMsg()
+            message.ParseFromString(data)
+            kind = message.WhichOneof('type')
+            if kind == 'script_finished':
+                if message.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                if message.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY:
+                    self.errors.append(f"script finished with status {message.script_finished}")
+                return
+            if kind != 'delta' or message.delta.WhichOneof('type') != 'new_element':
+                continue
+            element = message.delta.new_element
+            kind = element.WhichOneof('type')
+            if kind == 'selectbox':
+                self.selectboxes.setdefault(element.selectbox.id, list(element.selectbox.options))
+            elif kind == 'button' and self.button is None:
+                self.button = element.button.id
+            elif kind == 'markdown':
+                self.markdown.append(element.markdown.body)
+            elif kind == 'json':
+                self.json.append(element.json.body)
+            elif kind == 'exception':
+                self.errors.append(f"{element.exception.type}: {element.exception.message}")
+            elif kind == 'alert' and element.alert.format == Alert.ERROR:
+                self.errors.append(element.alert.body)
+
+
+async def run_flow(port, rng, timeout):
+    """One user journey in a new session; returns (page load seconds, assessment seconds)."""
+    async with Session(port, timeout) as session:
+        load_seconds = await session.rerun()
+        selections = {widget_id: rng.randrange(len(options)) for widget_id, options in session.selectboxes.items()}
+        await session.rerun(selections)
+        assess_seconds = await session.rerun(selections, click=True)
+
+    if session.errors:
+        raise RuntimeError(f"assessment failed: {session.errors[0]}")
+    if rendered_risk(session.markdown) is None:
+        raise RuntimeError("assessment finished without rendering a risk")
+    return load_seconds, assess_seconds
+
+
+async def executor_metrics(port, timeout):
+    # The server's inference_executor stats, from the service metrics the app renders as JSON
+    async with Session(port, timeout) as session:
+        await session.rerun()
+    for body in session.json:
+        snapshot = json.loads(body)
+        if 'inference_executor' in snapshot:
+            return snapshot['inference_executor']
+    return None
+
+
+def _tree_bytes(node):
+    # Serialized size of every element under node, i.e. what a rerun ships to the browser
+    proto = getattr(node, 'proto', None)
+    size = proto.ByteSize() if proto is not None else 0
+    for child in getattr(node, 'children', {}).values():
+        size += _tree_bytes(child)
+    return size
+
+
+def rerun_payload_bytes(script_path, timeout=120):
+    """Bytes of rendered elements for the first load, a plain rerun and an assessment rerun."""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(script_path, default_timeout=timeout)
+    app.run()
+    first = _tree_bytes(app.main) + _tree_bytes(app.sidebar)
+    app.run()
+    rerun = _tree_bytes(app.main) + _tree_bytes(app.sidebar)
+    app.button[0].click().run()
+    assessment = _tree_bytes(app.main) + _tree_bytes(app.sidebar)
+    return {'first_load': first, 'rerun': rerun, 'assessment': assessment}
+
+
+async def _drive(port, users, duration, timeout, seed):
+    results = []
+    errors = []
+
+    async def user(index, deadline):
+        rng = random.Random(seed + index)
+        while time.perf_counter() < deadline:
+            try:
+                results.append(await run_flow(port, rng, timeout))
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+
+    # One untimed flow loads the app's modules and cached artifacts in the server
+    await run_flow(port, random.Random(seed), timeout)
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i, start + duration) for i in range(users)))
+    return results, errors, time.perf_counter() - start
+
+
+def run_level(script_path, users, duration, timeout, seed, executor=True):
+    server, port = start_server(script_path, executor, timeout)
+    try:
+        loop = asyncio.new_event_loop()
+        cpu_start, _ = _process_usage(server.pid)
+        task = loop.create_task(_drive(port, users, duration, timeout, seed))
+        peak_rss = 0.0
+        while not task.done():
+            loop.run_until_complete(asyncio.wait([task], timeout=0.5))
+            peak_rss = max(peak_rss, _process_usage(server.pid)[1])
+        results, errors, wall = task.result()
+        cpu_end, _ = _process_usage(server.pid)
+        executor_stats = loop.run_until_complete(executor_metrics(port, timeout))
+        loop.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+    assess = np.array([a for _, a in results]) * 1000
+    load = np.array([l for l, _ in results]) * 1000
+    return {
+        'users': users,
+        'flows': len(results),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'throughput_per_min': len(results) / wall * 60,
+        'assess_p50_ms': float(np.percentile(assess, 50)) if len(assess) else float('nan'),
+        'assess_p95_ms': float(np.percentile(assess, 95)) if len(assess) else float('nan'),
+        'assess_p99_ms': float(np.percentile(assess, 99)) if len(assess) else float('nan'),
+        'load_p50_ms': float(np.percentile(load, 50)) if len(load) else float('nan'),
+        'cpu_cores_busy': (cpu_end - cpu_start) / wall,
+        'peak_rss_mb': peak_rss,
+        'queue_wait_p95_ms': executor_stats['wait_p95_ms'] if executor_stats and executor_stats['enabled'] else None,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test a Streamlit front end with headless sessions.')
+    parser.add_argument('script', nargs='?', default='app.py', help='app.py or heart_app2.py')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                        help='concurrent users to run, one level after another')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per level')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds before a rerun counts as failed')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--payload', action='store_true', help='only measure bytes sent per rerun')
+    parser.add_argument('--executor', choices=['on', 'off'], default='on',
+                        help='run model calls on the shared inference executor or inline')
+    args = parser.parse_args()
+
+    script_path = os.path.abspath(args.script)
+    # The apps open their artifacts relative to the working directory
+    os.chdir(os.path.dirname(script_path))
+
+    if args.payload:
+        os.environ['HEART_INFERENCE_EXECUTOR'] = '1' if args.executor == 'on' else '0'
+        payload = rerun_payload_bytes(script_path, args.timeout)
+        print(f"bytes per rerun: first load {payload['first_load']}, rerun {payload['rerun']}, "
+              f"assessment {payload['assessment']}")
+        raise SystemExit
+    print(f"{'users':>5} {'flows':>6} {'err':>4} {'flows/min':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'load p50':>8} {'cpu':>5} {'rss MB':>7} {'wait p95':>8}")
+    for users in args.levels:
+        r = run_level(script_path, users, args.duration, args.timeout, args.seed, args.executor == 'on')
+        wait = f"{r['queue_wait_p95_ms']:>8.1f}" if r['queue_wait_p95_ms'] is not None else f"{'-':>8}"
+        print(f"{r['users']:>5} {r['flows']:>6} {r['errors']:>4} {r['throughput_per_min']:>9.1f} "
+              f"{r['assess_p50_ms']:>8.0f} {r['assess_p95_ms']:>8.0f} {r['assess_p99_ms']:>8.0f} "
+              f"{r['load_p50_ms']:>8.0f} {r['cpu_cores_busy']:>5.2f} {r['peak_rss_mb']:>7.0f} {wait}", flush=True)
+        if r['first_error']:
+            print(f"      first error: {r['first_error']}")
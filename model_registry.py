@@ -0,0 +1,197 @@
+"""Multi-version model registry for A/B comparison and gradual rollout.
+
+Versions are discovered in a directory laid out like train.py's output:
+models/<version>/best_model.pkl. Every version shares the 22-field schema and
+the one encoder. A model is unpickled the first time it is used and gets the inference
+executor's per-call thread limit, like the apps' default model. Once the
+loaded models go over the memory budget (each model counted at the size of
+its pickle), the least recently used ones are dropped, and they are loaded
+again if needed later.
+
+Requests are routed by weight. With a routing key (session id, API client id),
+the key is hashed, so the same key always gets the same version while the
+weights stay the same. Weights come from models/registry.json
+({"weights": {"<version>": 0.9, ...}}); versions not listed there get no
+traffic unless nothing is listed, in which case all versions share it evenly.
+
+The apps use the registry when HEART_MODEL_REGISTRY points at such a directory.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+from artifacts import load_model
+from inference_executor import get_executor
+
+REGISTRY_DIR = os.environ.get('HEART_MODEL_REGISTRY')
+MEMORY_BUDGET_MB = float(os.environ.get('HEART_MODEL_MEMORY_MB', 1024))
+LATENCY_WINDOW = 1000
+
+
+class _VersionStats:
+    def __init__(self):
+        self.loads = 0
+        self.evictions = 0
+        self.calls = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self):
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'calls': self.calls,
+            'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else None,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, directory, weights=None, memory_budget_mb=MEMORY_BUDGET_MB):
+        self.directory = directory
+        self.memory_budget = memory_budget_mb * 2 ** 20
+        self._paths = self._discover()
+        if not self._paths:
+            raise ValueError(f"No model versions found in {directory}")
+        self._weights = self._normalise(weights if weights is not None else self._load_weights())
+        self._loaded = OrderedDict()  # version -> (model, size in bytes), least recently used first
+        self._stats = {version: _VersionStats() for version in self._paths}
+        self._lock = threading.Lock()
+        self._load_locks = {version: threading.Lock() for version in self._paths}
+
+    def _discover(self):
+        paths = {}
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name, 'best_model.pkl')
+            if os.path.isfile(path):
+                paths[name] = path
+        return paths
+
+    def _load_weights(self):
+        path = os.path.join(self.directory, 'registry.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f).get('weights', {})
+        return {}
+
+    def _normalise(self, weights):
+        unknown = set(weights) - set(self._paths)
+        if unknown:
+            raise ValueError(f"Weights given for unknown model versions: {sorted(unknown)}")
+        weights = {version: float(weight) for version, weight in weights.items() if weight > 0}
+        if not weights:
+            weights = {version: 1.0 for version in self._paths}
+        total = sum(weights.values())
+        # Cumulative boundaries in a fixed order, so routing is stable
+        boundaries = []
+        cumulative = 0.0
+        for version in sorted(weights):
+            cumulative += weights[version] / total
+            boundaries.append((cumulative, version))
+        return boundaries
+
+    @property
+    def versions(self):
+        return list(self._paths)
+
+    def route(self, key=None):
+        """Version for a request; the same key always gets the same version."""
+        if key is None:
+            point = random.random()
+        else:
+            digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+            point = int.from_bytes(digest, 'big') / 2 ** 64
+        for boundary, version in self._weights:
+            if point < boundary:
+                return version
+        return self._weights[-1][1]
+
+    def get(self, version):
+        with self._lock:
+            if version in self._loaded:
+                self._loaded.move_to_end(version)
+                return self._loaded[version][0]
+        if version not in self._paths:
+            raise KeyError(f"Unknown model version: {version}")
+
+        # One loader per version; other versions keep serving meanwhile
+        with self._load_locks[version]:
+            with self._lock:
+                if version in self._loaded:
+                    self._loaded.move_to_end(version)
+                    return self._loaded[version][0]
+            model = load_model(self._paths[version])
+            get_executor().limit_threads(model)
+            size = os.path.getsize(self._paths[version])
+            with self._lock:
+                self._loaded[version] = (model, size)
+                self._stats[version].loads += 1
+                self._evict()
+        return model
+
+    def _evict(self):
+        # Called under self._lock; the most recently used version is always kept
+        while len(self._loaded) > 1 and sum(size for _, size in self._loaded.values()) > self.memory_budget:
+            version, _ = self._loaded.popitem(last=False)
+            self._stats[version].evictions += 1
+
+    def predict_proba(self, version, X_encoded):
+        model = self.get(version)
+        start = time.perf_counter()
+        proba = model.predict_proba(X_encoded)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats = self._stats[version]
+            stats.calls += 1
+            stats.latencies.append(elapsed)
+        return proba
+
+    def predict_risk(self, input_data, encoder, key=None, version=None):
+        """Risk in % for one profile and the version that produced it (routed by key unless given)."""
+        version = version if version is not None else self.route(key)
+        input_encoded = encoder.transform(pd.DataFrame([input_data]), y=None, override_return_df=False)
+        return self.predict_proba(version, input_encoded)[:, 1][0] * 100, version
+
+    def _shares(self):
+        shares = {}
+        previous = 0.0
+        for boundary, version in self._weights:
+            shares[version] = round(boundary - previous, 4)
+            previous = boundary
+        return shares
+
+    def stats(self):
+        with self._lock:
+            loaded_bytes = sum(size for _, size in self._loaded.values())
+            return {
+                'versions': {version: {**stats.snapshot(), 'loaded': version in self._loaded}
+                             for version, stats in self._stats.items()},
+                'weights': self._shares(),
+                'loaded_mb': loaded_bytes / 2 ** 20,
+                'budget_mb': self.memory_budget / 2 ** 20,
+            }
+
+
+# Process-wide registry shared by every session, if configured
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if not REGISTRY_DIR:
+        return None
+    with _registry_lock:
+        if _registry is None:
+            import service_metrics
+
+            _registry = ModelRegistry(REGISTRY_DIR)
+            service_metrics.register('model_registry', _registry.stats)
+        return _registry
@@ -0,0 +1,187 @@
+"""Export the encoder + EasyEnsemble pipeline as one ONNX graph for onnxruntime.
+
+The graph takes the option codes of the 22 fields (int64, shape [N, 22], see
+features.frame_codes) and computes:
+
+    codes --Gather(compiled encoder table)--> encoded features
+          --TreeEnsembleClassifier, one per LightGBM member--> member probabilities
+          --Sum / n_members--> probabilities [N, 2]
+
+This matches EasyEnsembleClassifier.predict_proba. Trees are evaluated in
+float32 by onnxruntime, so risks agree with the native path to a small
+tolerance, not bit for bit.
+
+    python onnx_export.py --output heart_model.onnx --check --benchmark
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_NAMES, compile_encoder, frame_codes, profile_codes
+
+ONNX_MODEL_PATH = 'heart_model.onnx'
+PARITY_TOLERANCE = 1e-4
+
+
+def export_onnx(model, encoder):
+    """Build the ONNX ModelProto for the encoder and every ensemble member."""
+    import onnx
+    from onnx import TensorProto, helper
+    from onnx.compose import add_prefix
+    from onnxmltools import convert_lightgbm
+    from onnxmltools.convert.common.data_types import FloatTensorType
+
+    n_features = len(FEATURE_NAMES)
+    tables = compile_encoder(encoder).astype(np.float32)
+    n_options = tables.shape[1]
+
+    nodes = [
+        # Flat index of (feature, code) into the flattened table
+        helper.make_node('Add', ['codes', 'feature_offsets'], ['table_index']),
+        helper.make_node('Gather', ['encoder_table', 'table_index'], ['encoded'], axis=0),
+    ]
+    initializers = [
+        helper.make_tensor('feature_offsets', TensorProto.INT64, [n_features],
+                           (np.arange(n_features) * n_options).tolist()),
+        helper.make_tensor('encoder_table', TensorProto.FLOAT, [tables.size], tables.ravel().tolist()),
+    ]
+    opsets = {}
+
+    member_outputs = []
+    for i, (member, features) in enumerate(zip(model.estimators_, model.estimators_features_)):
+        lgbm = member.steps[-1][1]
+        member_model = convert_lightgbm(
+            lgbm, initial_types=[('input', FloatTensorType([None, len(features)]))],
+            zipmap=False, target_opset=15)
+        member_model = add_prefix(member_model, f'm{i}_')
+        graph = member_model.graph
+        for opset in member_model.opset_import:
+            opsets[opset.domain] = max(opsets.get(opset.domain, 0), opset.version)
+
+        member_input = graph.input[0].name
+        if len(features) == n_features and np.array_equal(features, np.arange(n_features)):
+            nodes.append(helper.make_node('Identity', ['encoded'], [member_input]))
+        else:
+            # Member trained on a feature subset
+            initializers.append(helper.make_tensor(f'm{i}_features', TensorProto.INT64, [len(features)],
+                                                   np.asarray(features).tolist()))
+            nodes.append(helper.make_node('Gather', ['encoded', f'm{i}_features'], [member_input], axis=1))
+        nodes.extend(graph.node)
+        initializers.extend(graph.initializer)
+        probabilities = [output.name for output in graph.output if output.name.endswith('probabilities')][0]
+        member_outputs.append(probabilities)
+
+    initializers.append(helper.make_tensor('n_members', TensorProto.FLOAT, [], [len(member_outputs)]))
+    nodes.append(helper.make_node('Sum', member_outputs, ['probability_sum']))
+    nodes.append(helper.make_node('Div', ['probability_sum', 'n_members'], ['probabilities']))
+
+    graph = helper.make_graph(
+        nodes, 'heart_disease_pipeline',
+        inputs=[helper.make_tensor_value_info('codes', TensorProto.INT64, [None, n_features])],
+        outputs=[helper.make_tensor_value_info('probabilities', TensorProto.FLOAT, [None, 2])],
+        initializer=initializers)
+    opsets[''] = max(opsets.get('', 0), 15)
+    onnx_model = helper.make_model(
+        graph, producer_name='heart_diagnosis',
+        opset_imports=[helper.make_opsetid(domain, version) for domain, version in opsets.items()])
+    onnx_model.ir_version = min(onnx_model.ir_version, 8)
+    onnx.checker.check_model(onnx_model)
+    return onnx_model
+
+
+class OnnxRiskModel:
+    """onnxruntime CPU scoring of the exported pipeline."""
+
+    def __init__(self, path=ONNX_MODEL_PATH, intra_op_threads=1):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def predict_proba_codes(self, codes):
+        return self.session.run(['probabilities'], {'codes': np.asarray(codes, dtype=np.int64).reshape(-1, len(FEATURE_NAMES))})[0]
+
+    def predict_proba_frame(self, df):
+        return self.predict_proba_codes(frame_codes(df))
+
+    def predict_risk(self, input_data):
+        # Same result as predict_heart_disease_risk in the apps, in %
+        return float(self.predict_proba_codes(profile_codes(input_data))[0, 1]) * 100
+
+
+def check_parity(onnx_model, model, encoder, X):
+    native = model.predict_proba(encoder.transform(X, y=None, override_return_df=False))[:, 1]
+    exported = onnx_model.predict_proba_frame(X)[:, 1]
+    errors = np.abs(native - exported)
+    return {'rows': len(X), 'max_abs_error': float(errors.max()), 'mean_abs_error': float(errors.mean())}
+
+
+def _time_per_call(fn, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def benchmark(onnx_model, model, encoder, X, batch_size=1000, repeats=50):
+    row = X.iloc[:1]
+    batch = X.iloc[:batch_size]
+    native_row = _time_per_call(lambda: model.predict_proba(encoder.transform(row, y=None, override_return_df=False)), repeats)
+    onnx_row = _time_per_call(lambda: onnx_model.predict_proba_frame(row), repeats)
+    native_batch = _time_per_call(lambda: model.predict_proba(encoder.transform(batch, y=None, override_return_df=False)), max(1, repeats // 10))
+    onnx_batch = _time_per_call(lambda: onnx_model.predict_proba_frame(batch), max(1, repeats // 10))
+    return {
+        'native_row_ms': native_row * 1000,
+        'onnx_row_ms': onnx_row * 1000,
+        'native_rows_per_s': len(batch) / native_batch,
+        'onnx_rows_per_s': len(batch) / onnx_batch,
+    }
+
+
+if __name__ == '__main__':
+    import onnx
+
+    from artifacts import DATA_PATH, ENCODER_PATH, MODEL_PATH, load_encoder, load_model, load_reference_data
+    from whatif import single_field_variants
+
+    parser = argparse.ArgumentParser(description='Export the encoder + ensemble pipeline to ONNX.')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--encoder', default=ENCODER_PATH)
+    parser.add_argument('--output', default=ONNX_MODEL_PATH)
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--sample', type=int, default=20000, help='reference rows used by --check and --benchmark')
+    parser.add_argument('--threads', type=int, default=1, help='onnxruntime intra-op threads')
+    parser.add_argument('--check', action='store_true', help='compare against predict_proba and fail on mismatch')
+    parser.add_argument('--benchmark', action='store_true', help='compare latency and throughput with the native path')
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    encoder = load_encoder(args.encoder)
+    start = time.perf_counter()
+    onnx.save(export_onnx(model, encoder), args.output)
+    print(f"exported {len(model.estimators_)} members to {args.output} in {time.perf_counter() - start:.1f}s")
+
+    if args.check or args.benchmark:
+        onnx_model = OnnxRiskModel(args.output, args.threads)
+        X = load_reference_data(args.data, sample=args.sample)[FEATURE_NAMES]
+
+    if args.check:
+        # Reference rows plus every single-field variant of one profile, so every option is covered
+        variants = pd.DataFrame([variant for _, _, variant in single_field_variants(X.iloc[0].to_dict())])
+        parity = check_parity(onnx_model, model, encoder, pd.concat([X, variants], ignore_index=True))
+        print(f"parity on {parity['rows']} rows: max abs error {parity['max_abs_error']:.2e}, "
+              f"mean {parity['mean_abs_error']:.2e} (tolerance {PARITY_TOLERANCE:.0e})")
+        if parity['max_abs_error'] > PARITY_TOLERANCE:
+            sys.exit("ONNX export does not match predict_proba")
+
+    if args.benchmark:
+        result = benchmark(onnx_model, model, encoder, X)
+        print(f"single row: native {result['native_row_ms']:.2f} ms, onnx {result['onnx_row_ms']:.2f} ms")
+        print(f"batch: native {result['native_rows_per_s']:.0f} rows/s, onnx {result['onnx_rows_per_s']:.0f} rows/s "
+              f"({args.threads} intra-op thread(s))")
@@ -0,0 +1,106 @@
+# Recommendation texts for an assessment, shared by app.py and the printable
+# reports. Each factor has the condition under which it gets a recommendation
+# and the text, where {importance} is the factor's share (%) of the SHAP
+# contributions.
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_LABELS, risk_band
+
+OLDER_AGES = ["Age_55_to_59", "Age_60_to_64", "Age_65_to_69", "Age_70_to_74", "Age_75_to_79", "Age_80_or_older"]
+
+RISK_SUMMARIES = {
+    'Very High Risk': "Your risk of heart disease is very high. Here are some recommendations to reduce your risk:",
+    'High Risk': "Your risk of heart disease is high. Here are some recommendations to reduce your risk:",
+    'Moderate Risk': "Your risk of heart disease is moderate. Here are some recommendations to reduce your risk:",
+    'Low Risk': "Your risk of heart disease is low. Keep up the good work and continue to maintain a healthy lifestyle.",
+}
+
+RECOMMENDATIONS = {
+    'ever_diagnosed_with_heart_attack': (
+        lambda p: p['ever_diagnosed_with_heart_attack'] == "yes",
+        "History of heart attack contributed {importance:.2f}% to your risk. Regularly visit your cardiologist and adhere to prescribed medications. Monitor any new or worsening symptoms and seek immediate medical attention if needed."),
+    'ever_diagnosed_with_a_stroke': (
+        lambda p: p['ever_diagnosed_with_a_stroke'] == "yes",
+        "History of stroke contributed {importance:.2f}% to your risk. Follow your neurologist's recommendations and take prescribed medications consistently. Engage in approved physical therapy or exercises to regain strength and mobility."),
+    'age_category': (
+        lambda p: p['age_category'] in OLDER_AGES,
+        "Age category contributed {importance:.2f}% to your risk. While you can't change your age, maintaining a healthy lifestyle can mitigate risks associated with aging. Ensure regular check-ups, eat a balanced diet, stay active, and avoid smoking."),
+    'general_health': (
+        lambda p: p['general_health'] in ["fair", "poor"],
+        "General health contributed {importance:.2f}% to your risk. Focus on improving your overall health through a balanced diet and regular check-ups."),
+    'ever_told_you_have_kidney_disease': (
+        lambda p: p['ever_told_you_have_kidney_disease'] == "yes",
+        "Kidney disease contributed {importance:.2f}% to your risk. Regularly monitor your kidney function and follow your doctor's advice to manage your condition. Stay hydrated and maintain a kidney-friendly diet."),
+    'ever_told_you_had_diabetes': (
+        lambda p: p['ever_told_you_had_diabetes'] == "yes",
+        "Diabetes contributed {importance:.2f}% to your risk. Manage your diabetes through diet, exercise, and medication as prescribed by your doctor."),
+    'smoking_status': (
+        lambda p: p['smoking_status'] != "never_smoked",
+        "Smoking status contributed {importance:.2f}% to your risk. Quit smoking to significantly reduce your risk of heart disease."),
+    'exercise_status_in_past_30_Days': (
+        lambda p: p['exercise_status_in_past_30_Days'] == "no",
+        "Lack of exercise contributed {importance:.2f}% to your risk. Engage in regular physical activity to improve your heart health."),
+    'binge_drinking_status': (
+        lambda p: p['binge_drinking_status'] == "yes",
+        "Binge drinking contributed {importance:.2f}% to your risk. Reducing or eliminating alcohol consumption can significantly lower your risk of heart disease. Consider seeking support for alcohol moderation or cessation if needed."),
+    'drinks_category': (
+        lambda p: p['drinks_category'] in ["high_consumption_10.01_to_20_drinks", "very_high_consumption_more_than_20_drinks"],
+        "Alcohol consumption contributed {importance:.2f}% to your risk. Limit alcohol consumption to lower your risk."),
+    'sleep_category': (
+        lambda p: p['sleep_category'] in ["short_sleep_4_to_5_hours", "very_short_sleep_0_to_3_hours"],
+        "Sleep category contributed {importance:.2f}% to your risk. Consider aiming for 7-9 hours of quality sleep each night. Adequate sleep is crucial for maintaining heart health."),
+    'physical_health_status': (
+        lambda p: p['physical_health_status'] in ["1_to_13_days_not_good", "14_plus_days_not_good"],
+        "Physical health contributed {importance:.2f}% to your risk. Engage in regular physical activity and consult a healthcare provider if you have persistent physical health issues."),
+    'mental_health_status': (
+        lambda p: p['mental_health_status'] in ["1_to_13_days_not_good", "14_plus_days_not_good"],
+        "Mental health contributed {importance:.2f}% to your risk. Consider seeking support from a mental health professional and practice stress-reducing activities."),
+    'asthma_Status': (
+        lambda p: p['asthma_Status'] in ["current_asthma", "former_asthma"],
+        "Asthma contributed {importance:.2f}% to your risk. Manage your asthma by following your treatment plan, avoiding asthma triggers, and using your medications as prescribed."),
+    'ever_told_you_had_a_depressive_disorder': (
+        lambda p: p['ever_told_you_had_a_depressive_disorder'] == "yes",
+        "Depressive disorder contributed {importance:.2f}% to your risk. Consider seeking support from a mental health professional, practicing stress-reducing activities, and maintaining a healthy lifestyle to manage depressive symptoms."),
+    'difficulty_walking_or_climbing_stairs': (
+        lambda p: p['difficulty_walking_or_climbing_stairs'] == "yes",
+        "Difficulty walking or climbing stairs contributed {importance:.2f}% to your risk. Consider consulting with a healthcare provider for appropriate interventions and exercises to improve mobility and strength."),
+    'length_of_time_since_last_routine_checkup': (
+        lambda p: p['length_of_time_since_last_routine_checkup'] != "past_year",
+        "Time since last routine checkup contributed {importance:.2f}% to your risk. Regular health checkups are important for early detection and management of health conditions. Schedule regular appointments with your healthcare provider to monitor and maintain your heart health."),
+    'could_not_afford_to_see_doctor': (
+        lambda p: p['could_not_afford_to_see_doctor'] == "yes",
+        "Difficulty affording to see a doctor contributed {importance:.2f}% to your risk. Explore community health services, sliding scale clinics, or health insurance options to ensure you have access to necessary medical care."),
+    'health_care_provider': (
+        lambda p: p['health_care_provider'] == "no",
+        "Not having a primary health care provider contributed {importance:.2f}% to your risk. Establishing a relationship with a primary care provider can help manage and prevent health issues. Consider finding a primary health care provider to ensure regular check-ups and consistent medical advice."),
+    'BMI': (
+        lambda p: p['BMI'] in ["overweight_bmi_25_to_29_9", "obese_bmi_30_or_more"],
+        "BMI contributed {importance:.2f}% to your risk. Maintaining a healthy weight through a balanced diet and regular exercise can help reduce your risk of heart disease. Consider consulting a healthcare provider for personalized advice."),
+}
+
+
+def risk_summary(risk):
+    return RISK_SUMMARIES[risk_band(risk)]
+
+
+def importance_shares(shap_array, features):
+    # Share (%) of the absolute SHAP contributions per feature, largest first
+    shares = np.abs(np.asarray(shap_array)).sum(axis=0)
+    return pd.Series(shares / shares.sum() * 100, index=list(features)).sort_values(ascending=False)
+
+
+def recommendations(input_data, shares):
+    """(feature, text) for every factor of input_data that has a recommendation, largest share first."""
+    found = [(feature, text.format(importance=shares[feature]))
+             for feature, (applies, text) in RECOMMENDATIONS.items() if applies(input_data)]
+    return sorted(found, key=lambda item: shares[item[0]], reverse=True)
+
+
+def contribution_chart_data(shares, features):
+    # Pie chart data: the given factors plus everything else as Other Factors
+    importances = [shares[feature] for feature in features]
+    return pd.DataFrame({
+        'Feature': [FEATURE_LABELS[feature] for feature in features] + ['Other Factors'],
+        'Importance': importances + [100 - sum(importances)],
+    })
@@ -0,0 +1,238 @@
+"""Printable per-patient assessment reports for clinic batches.
+
+Each report has the risk score and band and, above low risk, a pie chart of
+the contributing factors, with the same recommendation texts as app.py (see
+recommendations.py). Patients are
+read in chunks and handed to worker processes. Each worker loads the model
+and encoder once and scores and explains a whole chunk in one call. SHAP
+comes from the first ensemble member, as in the app, through LightGBM's
+TreeSHAP. The chart is drawn as inline SVG, so no browser or plotting backend
+is involved.
+
+Reports are written as <output>/<patient id>.html, and also as PDF with --pdf
+(this needs the optional weasyprint package). Ids that are not plain file
+names (path separators, leading dots, other characters) are reduced to safe
+characters plus a hash of the id, so every report stays inside <output>. The run ends with reports per
+minute and peak memory per worker.
+
+    python reports.py patients.csv reports/ --workers 8
+    python reports.py --patients 100000 reports/   # benchmark on BRFSS reference rows
+"""
+import argparse
+import hashlib
+import html
+import math
+import os
+import re
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from features import FEATURE_NAMES, risk_band
+from recommendations import contribution_chart_data, importance_shares, recommendations, risk_summary
+
+# Plotly's default qualitative colours, so printed charts look like the app's
+CHART_COLOURS = ['#636EFA', '#EF553B', '#00CC96', '#AB63FA', '#FFA15A',
+                 '#19D3F3', '#FF6692', '#B6E880', '#FF97FF', '#FECB52']
+SAFE_FILENAME = re.compile(r'[A-Za-z0-9_-][A-Za-z0-9._-]{0,99}')
+
+REPORT_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Heart disease risk assessment - {patient}</title>
+<style>
+body{{font-family:Helvetica,Arial,sans-serif;color:#1e293b;margin:2cm;font-size:11pt}}
+h1{{font-size:18pt;margin-bottom:0}}
+.risk{{font-size:28pt;font-weight:bold;margin:.5cm 0 0}}
+.band{{font-size:14pt;color:#475569}}
+.chart{{display:flex;align-items:center;gap:1cm;margin:.8cm 0}}
+.legend span{{display:inline-block;width:10pt;height:10pt;margin-right:6pt}}
+li{{margin-bottom:6pt}}
+footer{{margin-top:1cm;font-size:9pt;color:#64748b}}
+</style></head><body>
+<h1>HoloMed AI Heart Disease Risk Assessment</h1>
+<p>Patient: {patient}</p>
+<p class="risk">{risk:.2f}%</p><p class="band">{band}</p>
+{chart}
+<h2>Recommendations</h2>
+<p>{summary}</p>
+<ul>{recommendations}</ul>
+<footer>Model version {model_version}. This report is an estimate from survey data and does not replace a medical diagnosis.</footer>
+</body></html>
+"""
+
+CHART_TEMPLATE = """<h2>Contribution to Heart Disease Risk</h2>
+<div class="chart">{pie}<div class="legend">{legend}</div></div>"""
+
+
+def pie_svg(values, size=220):
+    """Pie chart of values as an inline SVG element, slices clockwise from 12 o'clock."""
+    values = np.clip(np.asarray(values, dtype=float), 0, None)
+    total = values.sum()
+    radius = size / 2
+    if total <= 0:
+        return f'<svg width="{size}" height="{size}"></svg>'
+    slices = []
+    angle = 0.0
+    for i, value in enumerate(values):
+        colour = CHART_COLOURS[i % len(CHART_COLOURS)]
+        sweep = value / total * 2 * math.pi
+        if sweep >= 2 * math.pi - 1e-9:
+            slices.append(f'<circle cx="{radius}" cy="{radius}" r="{radius}" fill="{colour}"/>')
+            break
+        if sweep > 0:
+            x1, y1 = radius + radius * math.sin(angle), radius - radius * math.cos(angle)
+            x2, y2 = radius + radius * math.sin(angle + sweep), radius - radius * math.cos(angle + sweep)
+            large = 1 if sweep > math.pi else 0
+            slices.append(f'<path d="M{radius},{radius} L{x1:.2f},{y1:.2f} A{radius},{radius} 0 {large} 1 '
+                          f'{x2:.2f},{y2:.2f} Z" fill="{colour}"/>')
+        angle += sweep
+    return f'<svg width="{size}" height="{size}" viewBox="0 0 {size} {size}">{"".join(slices)}</svg>'
+
+
+def render_report(patient, input_data, risk, shares, model_version):
+    """HTML of one report; shares is the importance_shares Series of the patient."""
+    # As in the app, low risk gets the summary only, without chart or recommendations
+    factor_recommendations = []
+    chart = ''
+    if risk > 25:
+        factor_recommendations = recommendations(input_data, shares)
+        chart_data = contribution_chart_data(shares, [feature for feature, _ in factor_recommendations])
+        legend = "<br>".join(
+            f'<span style="background:{CHART_COLOURS[i % len(CHART_COLOURS)]}"></span>'
+            f'{html.escape(label)} ({value:.1f}%)'
+            for i, (label, value) in enumerate(zip(chart_data['Feature'], chart_data['Importance'])))
+        chart = CHART_TEMPLATE.format(pie=pie_svg(chart_data['Importance']), legend=legend)
+    return REPORT_TEMPLATE.format(
+        patient=html.escape(str(patient)),
+        risk=risk,
+        band=risk_band(risk),
+        chart=chart,
+        summary=html.escape(risk_summary(risk)),
+        recommendations="".join(f"<li>{html.escape(text)}</li>" for _, text in factor_recommendations),
+        model_version=html.escape(model_version),
+    )
+
+
+def report_filename(patient):
+    """File name (without extension) for a patient id that cannot leave the output directory."""
+    patient = str(patient)
+    if SAFE_FILENAME.fullmatch(patient):
+        return patient
+    # Keep the readable part, and a hash so distinct ids never share a file
+    safe = re.sub(r'[^A-Za-z0-9_-]+', '_', patient)[:80]
+    return f"{safe}_{hashlib.sha1(patient.encode('utf-8')).hexdigest()[:12]}"
+
+
+_worker_state = {}
+
+
+def _init_worker(model_path, encoder_path, output_dir, pdf):
+    from artifacts import load_encoder, load_model, model_version
+
+    model = load_model(model_path)
+    # Workers are the parallelism; each one predicts single-threaded
+    for member in model.estimators_:
+        member.steps[-1][1].set_params(n_jobs=1)
+    first = model.estimators_[0]
+    _worker_state.update(
+        model=model,
+        encoder=load_encoder(encoder_path),
+        explained=(first.steps[-1][1].booster_, np.asarray(model.estimators_features_[0])),
+        # Reports always score with the full ensemble
+        model_version=model_version(model_path, tier='full'),
+        output_dir=output_dir,
+        pdf=pdf,
+    )
+
+
+def write_chunk(chunk, ids):
+    """Write the reports of one chunk; returns (reports, worker pid, worker peak RSS in MB)."""
+    state = _worker_state
+    X_encoded = np.asarray(state['encoder'].transform(chunk[FEATURE_NAMES], y=None, override_return_df=False),
+                           dtype=np.float64)
+    risks = state['model'].predict_proba(X_encoded)[:, 1] * 100
+    booster, features = state['explained']
+    contributions = booster.predict(X_encoded[:, features], pred_contrib=True, num_threads=1)[:, :-1]
+
+    if state['pdf']:
+        from weasyprint import HTML
+
+    for patient, input_data, risk, row in zip(ids, chunk[FEATURE_NAMES].to_dict('records'), risks, contributions):
+        shap_row = np.zeros(len(FEATURE_NAMES))
+        shap_row[features] = row
+        report = render_report(patient, input_data, risk, importance_shares(shap_row[None, :], FEATURE_NAMES),
+                               state['model_version'])
+        path = os.path.join(state['output_dir'], report_filename(patient))
+        with open(f"{path}.html", 'w') as f:
+            f.write(report)
+        if state['pdf']:
+            HTML(string=report).write_pdf(f"{path}.pdf")
+    return len(chunk), os.getpid(), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def generate_reports(chunks, output_dir, model_path, encoder_path, workers=4, pdf=False, id_column=None):
+    """Write a report per patient for an iterable of DataFrame chunks; returns (reports, peak RSS MB per worker)."""
+    os.makedirs(output_dir, exist_ok=True)
+    reports = 0
+    worker_rss = {}
+    offset = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, encoder_path, output_dir, pdf)) as executor:
+        pending = set()
+
+        def collect(done):
+            nonlocal reports
+            for future in done:
+                count, pid, rss = future.result()
+                reports += count
+                worker_rss[pid] = max(worker_rss.get(pid, 0), rss)
+
+        for chunk in chunks:
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            if id_column:
+                ids = chunk[id_column].astype(str).tolist()
+            else:
+                ids = [f"patient_{i}" for i in range(offset, offset + len(chunk))]
+            offset += len(chunk)
+            pending.add(executor.submit(write_chunk, chunk, ids))
+        collect(wait(pending).done)
+    return reports, worker_rss
+
+
+if __name__ == '__main__':
+    from artifacts import DATA_PATH, ENCODER_PATH, MODEL_PATH, load_reference_data
+    from batch_shap import read_chunks
+
+    parser = argparse.ArgumentParser(description='Generate printable assessment reports for a patient file.')
+    parser.add_argument('input', nargs='?', help='CSV (optionally compressed) or Parquet file with the 22 profile columns')
+    parser.add_argument('output', help='directory for the reports')
+    parser.add_argument('--patients', type=int, help='without an input file, use this many BRFSS reference rows')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--encoder', default=ENCODER_PATH)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunksize', type=int, default=500)
+    parser.add_argument('--id-column', help='column used to name the report files')
+    parser.add_argument('--pdf', action='store_true', help='also write PDFs (needs weasyprint)')
+    args = parser.parse_args()
+
+    if args.input:
+        columns = FEATURE_NAMES + ([args.id_column] if args.id_column else [])
+        chunks = read_chunks(args.input, args.chunksize, columns)
+    elif args.patients:
+        reference = load_reference_data(args.data, sample=args.patients)
+        reference = reference.sample(n=args.patients, replace=len(reference) < args.patients, random_state=0)
+        chunks = (reference.iloc[i:i + args.chunksize] for i in range(0, len(reference), args.chunksize))
+    else:
+        parser.error('give an input file or --patients')
+
+    start = time.perf_counter()
+    reports, worker_rss = generate_reports(chunks, args.output, args.model, args.encoder, args.workers, args.pdf,
+                                           args.id_column)
+    elapsed = time.perf_counter() - start
+    rss = list(worker_rss.values())
+    print(f"{reports} reports in {elapsed:.1f}s ({reports / elapsed * 60:.0f} reports/min with {args.workers} workers)")
+    print(f"peak memory per worker: max {max(rss):.0f} MB, mean {np.mean(rss):.0f} MB over {len(rss)} workers")
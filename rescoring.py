@@ -0,0 +1,256 @@
+"""Incremental re-scoring of the LightGBM ensemble after a few fields change.
+
+Every tree of every ensemble member is flattened into one set of node
+arrays, together with a (22, n_trees) mask of the fields each tree splits on.
+Scoring a profile keeps the leaf reached in every tree and each member's raw
+score (the sum of its leaf values). When fields change, only the trees that
+split on them are traversed again, and the member sums are patched with the
+differences of the old and new leaf values. The risk is then the mean of the
+member sigmoids, as in EasyEnsembleClassifier.predict_proba.
+
+Traversal is vectorised over (tree, row) pairs with numpy, so a what-if sweep
+re-evaluates the affected trees of every variant in a few array passes.
+
+    python rescoring.py --sample 500
+
+checks parity with predict_proba on random single-field edits and reports
+the speedup.
+"""
+import argparse
+import sys
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from features import FEATURE_NAMES, FEATURE_OPTIONS, OPTION_CODES, compile_encoder, encode_codes, profile_codes
+
+PARITY_TOLERANCE = 1e-6  # in risk %
+MAX_PAIRS = 2_000_000  # (tree, row) pairs traversed per batch
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+_MISSING_TYPES = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+_ZERO_THRESHOLD = 1e-35  # LightGBM's kZeroThreshold
+_FEATURE_INDEX = {feature: j for j, feature in enumerate(FEATURE_NAMES)}
+
+
+class ScoredProfile:
+    """Leaf reached in every tree and raw score of every member for one profile."""
+
+    def __init__(self, scorer, codes, leaves, raw, risk):
+        self.scorer = scorer
+        self.codes = codes
+        self.leaves = leaves
+        self.raw = raw
+        self.risk = risk
+
+
+def _flatten(structure, features, nodes):
+    # Appends the subtree to nodes in preorder and returns (root index, depth).
+    # Leaves point to themselves, so a traversal can keep stepping once it is done.
+    index = len(nodes)
+    if 'leaf_value' in structure:
+        nodes.append((-1, 0.0, index, index, False, MISSING_NONE, structure['leaf_value']))
+        return index, 0
+    if structure['decision_type'] != '<=':
+        raise ValueError("Categorical splits are not supported")
+    nodes.append(None)
+    left, left_depth = _flatten(structure['left_child'], features, nodes)
+    right, right_depth = _flatten(structure['right_child'], features, nodes)
+    nodes[index] = (features[structure['split_feature']], structure['threshold'], left, right,
+                    structure['default_left'], _MISSING_TYPES[structure['missing_type']], 0.0)
+    return index, max(left_depth, right_depth) + 1
+
+
+class IncrementalScorer:
+    def __init__(self, model, encoder):
+        self.tables = compile_encoder(encoder)
+        nodes = []
+        roots = []
+        tree_member = []
+        self.max_depth = 0
+        for m, (member, features) in enumerate(zip(model.estimators_, model.estimators_features_)):
+            lgbm = member.steps[-1][1]
+            if lgbm.objective_ != 'binary':
+                raise ValueError(f"Unsupported objective: {lgbm.objective_}")
+            features = np.asarray(features)
+            for tree in lgbm.booster_.dump_model()['tree_info']:
+                root, depth = _flatten(tree['tree_structure'], features, nodes)
+                roots.append(root)
+                tree_member.append(m)
+                self.max_depth = max(self.max_depth, depth)
+
+        columns = list(zip(*nodes))
+        self.feature = np.array(columns[0], dtype=np.int64)
+        self.threshold = np.array(columns[1], dtype=np.float64)
+        self.left = np.array(columns[2], dtype=np.int64)
+        self.right = np.array(columns[3], dtype=np.int64)
+        self.default_left = np.array(columns[4], dtype=bool)
+        self.missing = np.array(columns[5], dtype=np.int8)
+        self.value = np.array(columns[6], dtype=np.float64)
+        self.root = np.array(roots, dtype=np.int64)
+        self.tree_member = np.array(tree_member, dtype=np.int64)
+        self.n_trees = len(roots)
+        self.n_members = len(model.estimators_)
+
+        # uses[j, t]: tree t splits on field j somewhere
+        self.uses = np.zeros((len(FEATURE_NAMES), self.n_trees), dtype=bool)
+        tree_of_node = np.repeat(np.arange(self.n_trees), np.diff(np.append(self.root, len(nodes))))
+        splits = self.feature >= 0
+        self.uses[self.feature[splits], tree_of_node[splits]] = True
+        self._uses_counts = self.uses.astype(np.uint8)
+
+    def _leaves(self, trees, X, rows):
+        # Leaf reached by row rows[i] of X in tree trees[i], for every pair at once
+        node = self.root[trees]
+        for _ in range(self.max_depth):
+            feature = self.feature[node]
+            if not (feature >= 0).any():
+                break
+            x = X[rows, np.maximum(feature, 0)]
+            nan = np.isnan(x)
+            missing = self.missing[node]
+            x = np.where(nan & (missing != MISSING_NAN), 0.0, x)
+            default = ((missing == MISSING_ZERO) & (np.abs(x) <= _ZERO_THRESHOLD)) | ((missing == MISSING_NAN) & nan)
+            go_left = np.where(default, self.default_left[node], x <= self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    @staticmethod
+    def _risk(raw):
+        return (1 / (1 + np.exp(-raw))).mean(axis=-1) * 100
+
+    def score(self, input_data, previous=None):
+        """ScoredProfile for input_data, re-evaluating only trees on fields changed since previous."""
+        codes = profile_codes(input_data)
+        encoded = encode_codes(self.tables, codes)[None, :]
+        if previous is None or previous.scorer is not self:
+            trees = np.arange(self.n_trees)
+            leaves = self._leaves(trees, encoded, np.zeros(self.n_trees, dtype=np.int64))
+            raw = np.bincount(self.tree_member, weights=self.value[leaves], minlength=self.n_members)
+            return ScoredProfile(self, codes, leaves, raw, self._risk(raw))
+
+        changed = np.flatnonzero(codes != previous.codes)
+        if not len(changed):
+            return previous
+        trees = np.flatnonzero(self.uses[changed].any(axis=0))
+        new_leaves = self._leaves(trees, encoded, np.zeros(len(trees), dtype=np.int64))
+        delta = self.value[new_leaves] - self.value[previous.leaves[trees]]
+        leaves = previous.leaves.copy()
+        leaves[trees] = new_leaves
+        raw = previous.raw + np.bincount(self.tree_member[trees], weights=delta, minlength=self.n_members)
+        return ScoredProfile(self, codes, leaves, raw, self._risk(raw))
+
+    def score_changes(self, input_data, changes, base=None):
+        """Risk in % of input_data with each {feature: option} dict of changes applied.
+
+        base, a ScoredProfile of input_data (e.g. the session's last
+        assessment), saves the one full traversal of the current profile.
+        """
+        codes = profile_codes(input_data)
+        if base is None or base.scorer is not self or not np.array_equal(base.codes, codes):
+            base = self.score(input_data)
+
+        variant_codes = np.tile(codes, (len(changes), 1))
+        for i, change in enumerate(changes):
+            for feature, option in change.items():
+                variant_codes[i, _FEATURE_INDEX[feature]] = OPTION_CODES[feature][option]
+        X = encode_codes(self.tables, variant_codes)
+        changed = (variant_codes != codes).astype(np.uint8)
+
+        risks = np.empty(len(changes))
+        step = max(1, MAX_PAIRS // self.n_trees)
+        for start in range(0, len(changes), step):
+            stop = min(start + step, len(changes))
+            affected = (changed[start:stop] @ self._uses_counts) > 0
+            rows, trees = np.nonzero(affected)
+            leaves = self._leaves(trees, X[start:stop], rows)
+            delta = self.value[leaves] - self.value[base.leaves[trees]]
+            patch = np.bincount(rows * self.n_members + self.tree_member[trees], weights=delta,
+                                minlength=(stop - start) * self.n_members)
+            risks[start:stop] = self._risk(base.raw + patch.reshape(stop - start, self.n_members))
+        return risks
+
+
+# One scorer per (model, encoder), built on first use; None for models it cannot handle
+_scorers = weakref.WeakKeyDictionary()
+_scorers_lock = threading.Lock()
+
+
+def get_rescorer(model, encoder):
+    with _scorers_lock:
+        entry = _scorers.get(model)
+        if entry is not None and entry[0] is encoder:
+            return entry[1]
+    try:
+        scorer = IncrementalScorer(model, encoder)
+    except (AttributeError, ValueError, KeyError):
+        # Not an EasyEnsemble of binary LightGBM members, e.g. the distilled tier
+        scorer = None
+    with _scorers_lock:
+        _scorers[model] = (encoder, scorer)
+    return scorer
+
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    from artifacts import DATA_PATH, ENCODER_PATH, MODEL_PATH, load_encoder, load_model, load_reference_data
+    from whatif import single_field_variants
+
+    parser = argparse.ArgumentParser(description='Check and time incremental re-scoring against predict_proba.')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--encoder', default=ENCODER_PATH)
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--sample', type=int, default=500, help='profiles to edit')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    encoder = load_encoder(args.encoder)
+    start = time.perf_counter()
+    scorer = IncrementalScorer(model, encoder)
+    print(f"flattened {scorer.n_trees} trees of {scorer.n_members} members ({len(scorer.value)} nodes, "
+          f"max depth {scorer.max_depth}) in {time.perf_counter() - start:.1f}s")
+
+    profiles = load_reference_data(args.data, sample=args.sample, random_state=args.seed)[FEATURE_NAMES]
+    rng = np.random.default_rng(args.seed)
+    errors, native_times, full_times, edit_times, trees_evaluated = [], [], [], [], []
+    for profile in profiles.to_dict('records'):
+        base = scorer.score(profile)
+        feature = FEATURE_NAMES[rng.integers(len(FEATURE_NAMES))]
+        edited = {**profile, feature: rng.choice([o for o in FEATURE_OPTIONS[feature] if o != profile[feature]])}
+
+        start = time.perf_counter()
+        native = model.predict_proba(encoder.transform(pd.DataFrame([edited]), y=None, override_return_df=False))[0, 1] * 100
+        native_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        scorer.score(edited)
+        full_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        incremental = scorer.score(edited, base).risk
+        edit_times.append(time.perf_counter() - start)
+
+        errors.append(abs(native - incremental))
+        trees_evaluated.append(scorer.uses[_FEATURE_INDEX[feature]].sum())
+
+    profile = profiles.iloc[0].to_dict()
+    changes = [{feature: option} for feature, option, _ in single_field_variants(profile)]
+    variants = pd.DataFrame([variant for _, _, variant in single_field_variants(profile)])
+    start = time.perf_counter()
+    native_sweep = model.predict_proba(encoder.transform(variants, y=None, override_return_df=False))[:, 1] * 100
+    native_sweep_time = time.perf_counter() - start
+    start = time.perf_counter()
+    incremental_sweep = scorer.score_changes(profile, changes)
+    sweep_time = time.perf_counter() - start
+    errors.extend(np.abs(native_sweep - incremental_sweep))
+
+    native_ms, full_ms, edit_ms = (np.mean(t) * 1000 for t in (native_times, full_times, edit_times))
+    print(f"single-field edit: predict_proba {native_ms:.2f} ms, full traversal {full_ms:.2f} ms, "
+          f"incremental {edit_ms:.2f} ms ({native_ms / edit_ms:.1f}x), "
+          f"{np.mean(trees_evaluated) / scorer.n_trees:.0%} of trees re-evaluated on average")
+    print(f"what-if sweep of {len(changes)} variants: predict_proba {native_sweep_time * 1000:.1f} ms, "
+          f"incremental {sweep_time * 1000:.1f} ms ({native_sweep_time / sweep_time:.1f}x)")
+    print(f"parity on {len(errors)} scores: max abs error {max(errors):.2e}% (tolerance {PARITY_TOLERANCE:.0e}%)")
+    if max(errors) > PARITY_TOLERANCE:
+        sys.exit("incremental re-scoring does not match predict_proba")
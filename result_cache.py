@@ -0,0 +1,226 @@
+"""Persistent result cache shared by every app and API process on a host.
+
+Results are stored in SQLite in WAL mode, so several processes can read and
+write the same file at once and entries survive restarts. The key is the
+packed 22-field profile (features.pack_profile) plus the model version
+(artifacts.model_version). Each entry holds the risk in % and the SHAP
+contribution vector shown by the apps. Once the table holds more than
+max_entries, the least recently used entries are deleted. The last-used time
+is refreshed at most once per TOUCH_INTERVAL, so most hits are pure reads.
+
+The cache is best effort: if the database stays locked past the timeout, a
+lookup counts as a miss and a write is skipped.
+
+The apps use it when HEART_RESULT_CACHE is set to the database path. Warm it
+offline from the most frequent profiles in the audit log, and measure hit
+rate and lookup latency by replaying recent assessments:
+
+    python result_cache.py cache/results.sqlite --warm 50000 --replay 100000
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from features import FEATURE_NAMES, compile_encoder, encode_codes, pack_profile, unpack_codes
+
+RESULT_CACHE_PATH = os.environ.get('HEART_RESULT_CACHE')
+MAX_ENTRIES = int(os.environ.get('HEART_RESULT_CACHE_ENTRIES', 1_000_000))
+TOUCH_INTERVAL = 60  # seconds
+EVICT_EVERY = 1000  # writes between size checks
+LATENCY_WINDOW = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    profile INTEGER NOT NULL,
+    model_version TEXT NOT NULL,
+    risk REAL NOT NULL,
+    contributions BLOB,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (profile, model_version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+"""
+
+
+class ResultCache:
+    def __init__(self, path, max_entries=MAX_ENTRIES, timeout=5.0):
+        self.path = path
+        self.max_entries = max_entries
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One connection per process; SQLite calls are short, so sessions share it under a lock
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._writes = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def lookup(self, key, version):
+        """(risk, contributions or None) for a packed profile key, or None on a miss."""
+        start = time.perf_counter()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    'SELECT risk, contributions, last_used FROM results WHERE profile = ? AND model_version = ?',
+                    (int(key), version)).fetchone()
+                now = int(time.time())
+                if row is not None and row[2] < now - TOUCH_INTERVAL:
+                    self._conn.execute('UPDATE results SET last_used = ? WHERE profile = ? AND model_version = ?',
+                                       (now, int(key), version))
+            except sqlite3.OperationalError:
+                self.errors += 1
+                row = None
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self._latencies.append(time.perf_counter() - start)
+        if row is None:
+            return None
+        contributions = np.frombuffer(row[1], dtype=np.float32) if row[1] is not None else None
+        return row[0], contributions
+
+    def get(self, input_data, version):
+        return self.lookup(pack_profile(input_data), version)
+
+    def put_many(self, entries):
+        """Store (key, version, risk, contributions or None) tuples in one transaction."""
+        now = int(time.time())
+        rows = [(int(key), version, float(risk),
+                 np.asarray(contributions, dtype=np.float32).tobytes() if contributions is not None else None, now)
+                for key, version, risk, contributions in entries]
+        with self._lock:
+            try:
+                self._conn.execute('BEGIN IMMEDIATE')
+                self._conn.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)', rows)
+                self._conn.execute('COMMIT')
+            except sqlite3.OperationalError:
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                self.errors += 1
+                return
+            previous = self._writes
+            self._writes += len(rows)
+            if self._writes // EVICT_EVERY != previous // EVICT_EVERY:
+                self._evict()
+
+    def put(self, input_data, version, risk, contributions=None):
+        self.put_many([(pack_profile(input_data), version, risk, contributions)])
+
+    def _evict(self):
+        # Called under self._lock; deletes down to 90% of max_entries, least recently used first
+        try:
+            count = self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    'DELETE FROM results WHERE (profile, model_version) IN '
+                    '(SELECT profile, model_version FROM results ORDER BY last_used LIMIT ?)',
+                    (count - int(self.max_entries * 0.9),))
+        except sqlite3.OperationalError:
+            self.errors += 1
+
+    def cached_keys(self, version):
+        with self._lock:
+            rows = self._conn.execute('SELECT profile FROM results WHERE model_version = ?', (version,)).fetchall()
+        return {row[0] for row in rows}
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'errors': self.errors,
+                'lookup_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+                'lookup_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+                'file_mb': os.path.getsize(self.path) / 2 ** 20,
+            }
+
+
+def warm(cache, model, encoder, version, keys, scoring_model=None, batch_size=5000):
+    """Score and store every packed profile in keys that is not cached yet; returns how many were added.
+
+    Risks come from scoring_model (default: model), contributions from
+    TreeSHAP on the first ensemble member of model, as in the apps.
+    """
+    scoring_model = scoring_model if scoring_model is not None else model
+    cached = cache.cached_keys(version)
+    keys = np.array([key for key in keys if int(key) not in cached], dtype=np.uint64)
+    tables = compile_encoder(encoder)
+    booster = model.estimators_[0].steps[-1][1].booster_
+    features = np.asarray(model.estimators_features_[0])
+
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        X = encode_codes(tables, unpack_codes(batch))
+        risks = scoring_model.predict_proba(X)[:, 1] * 100
+        contributions = np.zeros((len(batch), len(FEATURE_NAMES)), dtype=np.float32)
+        contributions[:, features] = booster.predict(X[:, features], pred_contrib=True)[:, :-1]
+        cache.put_many(zip(batch, [version] * len(batch), risks, contributions))
+    return len(keys)
+
+
+# Process-wide cache, if configured
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _cache
+    if not RESULT_CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            import service_metrics
+
+            _cache = ResultCache(RESULT_CACHE_PATH)
+            service_metrics.register('result_cache', _cache.stats)
+        return _cache
+
+
+if __name__ == '__main__':
+    from artifacts import ENCODER_PATH, MODEL_PATH, load_encoder, load_model, load_scoring_model, model_version
+    from audit_log import AUDIT_LOG_PATH, read_audit_log
+
+    parser = argparse.ArgumentParser(description='Warm and measure the persistent result cache.')
+    parser.add_argument('path', nargs='?', default=RESULT_CACHE_PATH or os.path.join('cache', 'results.sqlite'))
+    parser.add_argument('--audit-log', default=AUDIT_LOG_PATH)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--encoder', default=ENCODER_PATH)
+    parser.add_argument('--max-entries', type=int, default=MAX_ENTRIES)
+    parser.add_argument('--warm', type=int, metavar='N', help='cache the N most frequent profiles in the audit log')
+    parser.add_argument('--replay', type=int, metavar='N', help='look up the last N audited profiles and report hit rate')
+    args = parser.parse_args()
+
+    cache = ResultCache(args.path, args.max_entries)
+    log = read_audit_log(args.audit_log, decode=False)
+    # Same version string as the apps, including the scoring tier
+    version = model_version(args.model)
+
+    if args.warm:
+        model = load_model(args.model)
+        frequent = log['profile'].value_counts().index.values[:args.warm]
+        start = time.perf_counter()
+        added = warm(cache, model, load_encoder(args.encoder), version, frequent, load_scoring_model(model))
+        print(f"warmed {added} of the {len(frequent)} most frequent profiles in {time.perf_counter() - start:.1f}s "
+              f"(covering {log['profile'].isin(frequent).mean():.1%} of audited assessments)")
+
+    if args.replay:
+        for key in log['profile'].values[-args.replay:]:
+            cache.lookup(key, version)
+        stats = cache.stats()
+        print(f"replayed {stats['hits'] + stats['misses']} assessments: hit rate {stats['hit_rate']:.1%}, "
+              f"lookup p50 {stats['lookup_p50_ms']:.3f} ms, p99 {stats['lookup_p99_ms']:.3f} ms, "
+              f"{stats['file_mb']:.1f} MB on disk")
@@ -0,0 +1,21 @@
+# Process-wide registry of service metrics. Components register a callable
+# that returns a JSON-friendly dict; snapshot() collects them all. The apps
+# show the snapshot in the sidebar when HEART_SERVICE_METRICS=1.
+import os
+import threading
+
+_collectors = {}
+_lock = threading.Lock()
+
+ENABLED = os.environ.get('HEART_SERVICE_METRICS') == '1'
+
+
+def register(name, collector):
+    with _lock:
+        _collectors[name] = collector
+
+
+def snapshot():
+    with _lock:
+        collectors = dict(_collectors)
+    return {name: collector() for name, collector in collectors.items()}
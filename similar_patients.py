@@ -0,0 +1,177 @@
+"""Observed outcomes of the BRFSS respondents most similar to a profile.
+
+Similarity is the number of fields (of 22) that differ. The index is built
+offline from the reference dataset. Every distinct profile is packed into a
+uint64 (features.pack_codes) and stored in a sorted key array along with its
+respondent count and the number who had heart disease. A lookup is a binary
+search for the exact profile, then a probe of every packed neighbour at
+distance 1 and 2. Fields have few options, so that is about 60 + 1,800 keys,
+searched in one vectorised np.searchsorted. No scan over the dataset is
+needed, and nothing beyond the sorted table is kept in memory.
+
+Build the index once:
+
+    python similar_patients.py --data brfss2022_data_wrangling_output.zip
+"""
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_BITS, FEATURE_NAMES, FEATURE_OPTIONS, FEATURE_SHIFTS, frame_codes, pack_codes, profile_codes
+
+INDEX_PATH = 'similar_index.npz'
+DISTANCE_LABELS = {0: 'Same answers to all 22 questions', 1: 'One answer different', 2: 'Two answers different'}
+
+
+def _single_changes():
+    # Every (field, option) with its bit mask and packed value, as parallel arrays
+    fields, options, masks, values = [], [], [], []
+    for j, feature in enumerate(FEATURE_NAMES):
+        mask = ((1 << FEATURE_BITS[j]) - 1) << int(FEATURE_SHIFTS[j])
+        for code in range(len(FEATURE_OPTIONS[feature])):
+            fields.append(j)
+            options.append(code)
+            masks.append(mask)
+            values.append(code << int(FEATURE_SHIFTS[j]))
+    return (np.array(fields), np.array(options),
+            np.array(masks, dtype=np.uint64), np.array(values, dtype=np.uint64))
+
+
+_FIELDS, _OPTIONS, _MASKS, _VALUES = _single_changes()
+# Pairs of single changes on two different fields
+_a, _b = np.triu_indices(len(_FIELDS), k=1)
+_PAIR_A, _PAIR_B = _a[_FIELDS[_a] != _FIELDS[_b]], _b[_FIELDS[_a] != _FIELDS[_b]]
+
+
+def neighbour_keys(codes):
+    """Packed keys of every profile at distance 1 and 2 from codes, with their distances."""
+    packed = pack_codes(codes)
+    differs = _OPTIONS != codes[_FIELDS]
+    single = (packed & ~_MASKS[differs]) | _VALUES[differs]
+
+    pairs = differs[_PAIR_A] & differs[_PAIR_B]
+    a, b = _PAIR_A[pairs], _PAIR_B[pairs]
+    double = (packed & ~(_MASKS[a] | _MASKS[b])) | _VALUES[a] | _VALUES[b]
+    return (np.concatenate([single, double]),
+            np.concatenate([np.ones(len(single), dtype=np.int64), np.full(len(double), 2, dtype=np.int64)]))
+
+
+class SimilarPatientIndex:
+    def __init__(self, keys, respondents, positives):
+        self.keys = keys
+        self.respondents = respondents
+        self.positives = positives
+
+    @classmethod
+    def build(cls, data):
+        packed = pack_codes(frame_codes(data[FEATURE_NAMES]))
+        keys, inverse = np.unique(packed, return_inverse=True)
+        respondents = np.bincount(inverse).astype(np.uint32)
+        positives = np.bincount(inverse, weights=data['heart_disease'].values).astype(np.uint32)
+        return cls(keys, respondents, positives)
+
+    def save(self, path=INDEX_PATH):
+        np.savez(path, keys=self.keys, respondents=self.respondents, positives=self.positives)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path) as f:
+            return cls(f['keys'], f['respondents'], f['positives'])
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.respondents.nbytes + self.positives.nbytes
+
+    def _find(self, keys):
+        # Index into the table of each key, -1 where absent
+        positions = np.searchsorted(self.keys, keys)
+        positions = np.minimum(positions, len(self.keys) - 1)
+        return np.where(self.keys[positions] == keys, positions, -1)
+
+    def lookup(self, input_data, k=50):
+        """Nearest stored profiles by increasing distance until at least k respondents are covered.
+
+        Returns a DataFrame with Distance, Respondents, Heart Disease and the
+        packed Profile key, one row per distinct profile, at most 2 fields away.
+        """
+        codes = profile_codes(input_data)
+        keys, distances = neighbour_keys(codes)
+        keys = np.concatenate([[pack_codes(codes)], keys])
+        distances = np.concatenate([[0], distances])
+
+        positions = self._find(keys)
+        found = positions >= 0
+        positions, distances = positions[found], distances[found]
+        respondents = self.respondents[positions].astype(np.int64)
+        # Closest first, and the most common profiles first within a distance
+        order = np.lexsort((-respondents, distances))
+        positions, distances, respondents = positions[order], distances[order], respondents[order]
+        covered = np.cumsum(respondents)
+        n = int(np.searchsorted(covered, k) + 1) if len(covered) else 0
+
+        return pd.DataFrame({
+            'Distance': distances[:n],
+            'Respondents': respondents[:n],
+            'Heart Disease': self.positives[positions[:n]].astype(np.int64),
+            'Profile': self.keys[positions[:n]],
+        })
+
+    def summary(self, input_data, k=50):
+        # Respondents and observed heart disease rate per distance, for the results card
+        neighbours = self.lookup(input_data, k)
+        grouped = neighbours.groupby('Distance')[['Respondents', 'Heart Disease']].sum()
+        grouped['Rate'] = grouped['Heart Disease'] / grouped['Respondents'] * 100
+        return grouped.reset_index()
+
+
+# Process-wide index shared by every session, if it has been built
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_similar_index(path=INDEX_PATH):
+    global _index
+    if not os.path.exists(path):
+        return None
+    with _index_lock:
+        if _index is None:
+            import service_metrics
+
+            _index = SimilarPatientIndex.load(path)
+            service_metrics.register('similar_patients', lambda: {
+                'profiles': len(_index.keys),
+                'respondents': int(_index.respondents.sum()),
+                'memory_mb': _index.nbytes / 2 ** 20,
+            })
+        return _index
+
+
+if __name__ == '__main__':
+    from artifacts import DATA_PATH, load_reference_data
+
+    parser = argparse.ArgumentParser(description='Build the similar-patient index over the reference dataset.')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--output', default=INDEX_PATH)
+    parser.add_argument('--queries', type=int, default=1000, help='random lookups timed after the build')
+    args = parser.parse_args()
+
+    data = load_reference_data(args.data)
+    start = time.perf_counter()
+    index = SimilarPatientIndex.build(data)
+    index.save(args.output)
+    print(f"{len(data)} respondents, {len(index.keys)} distinct profiles indexed in {time.perf_counter() - start:.1f}s; "
+          f"{index.nbytes / 2 ** 20:.1f} MB in memory, written to {args.output}")
+
+    queries = data[FEATURE_NAMES].sample(n=min(args.queries, len(data)), random_state=0).to_dict('records')
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.lookup(query)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    print(f"lookup: p50 {np.percentile(timings, 50):.2f} ms, p99 {np.percentile(timings, 99):.2f} ms "
+          f"over {len(queries)} queries")
@@ -0,0 +1,62 @@
+# Static page assets built once per process and served from memory on every rerun.
+# CSS is minified, images are decoded and resized once, and the static markup
+# of the page shell is built once, so a rerun only does the work for the
+# dynamic parts of the page.
+import io
+import re
+
+import streamlit as st
+from PIL import Image
+
+_CSS_COMMENTS = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};:,>])\s*')
+
+
+def minify_css(css):
+    css = _CSS_COMMENTS.sub('', css)
+    css = _CSS_SPACE.sub(' ', css)
+    css = _CSS_PUNCTUATION.sub(r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_html(html):
+    # Whitespace runs between tags collapse to one space (which keeps inline
+    # elements apart), indentation is dropped, and text is left alone
+    return re.sub(r'>\s+<', '> <', re.sub(r'\n\s*', '\n', html)).strip()
+
+
+@st.cache_resource(show_spinner=False)
+def style_tag(css):
+    # <style> element for inline CSS, minified once per distinct stylesheet
+    return f"<style>{minify_css(css)}</style>"
+
+
+@st.cache_resource(show_spinner=False)
+def css_file_tag(file_name):
+    with open(file_name) as f:
+        return style_tag(f.read())
+
+
+@st.cache_resource(show_spinner=False)
+def static_markup(html):
+    return minify_html(html)
+
+
+@st.cache_resource(show_spinner=False)
+def image_png(file_name, width):
+    """PNG bytes of an image resized to width pixels (at 2x for high-DPI screens)."""
+    image = Image.open(file_name)
+    target = min(image.width, width * 2)
+    image = image.resize((target, round(image.height * target / image.width)), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+@st.cache_resource(show_spinner=False)
+def page_icon(file_name, size=64):
+    # set_page_config ships the icon with every rerun, so keep it small
+    image = Image.open(file_name)
+    image.thumbnail((size, size), Image.LANCZOS)
+    return image
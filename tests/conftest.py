@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to the apps
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def fitted():
+    """Small EasyEnsemble of LightGBM members and its encoder, fitted on random profiles.
+
+    Returns (model, encoder, X) so tests run without the trained artifacts.
+    """
+    np = pytest.importorskip('numpy')
+    pd = pytest.importorskip('pandas')
+    lightgbm = pytest.importorskip('lightgbm')
+    imblearn_ensemble = pytest.importorskip('imblearn.ensemble')
+    ce = pytest.importorskip('category_encoders')
+    from features import FEATURE_NAMES, FEATURE_OPTIONS, frame_codes
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({feature: rng.choice(options, 4000) for feature, options in FEATURE_OPTIONS.items()})
+    # Outcome driven by a few fields, so the trees split on some fields and not others
+    codes = frame_codes(X)
+    logit = codes[:, FEATURE_NAMES.index('age_category')] / 4 + codes[:, FEATURE_NAMES.index('smoking_status')] - 3
+    y = (rng.random(len(X)) < 1 / (1 + np.exp(-logit))).astype(int)
+
+    encoder = ce.CatBoostEncoder(cols=FEATURE_NAMES).fit(X, y)
+    model = imblearn_ensemble.EasyEnsembleClassifier(
+        n_estimators=3, random_state=0,
+        estimator=lightgbm.LGBMClassifier(n_estimators=30, num_leaves=15, verbose=-1))
+    model.fit(encoder.transform(X, y=None, override_return_df=False), y)
+    return model, encoder, X.assign(heart_disease=y)
@@ -0,0 +1,47 @@
+# The distilled tier must survive a save/load round trip, including a model
+# written by the distill.py CLI, which runs as __main__.
+import os
+import pickle as pkl
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('lightgbm')
+
+from artifacts import load_scoring_model
+from distill import DISTILLED_KINDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('kind', sorted(DISTILLED_KINDS))
+def test_pickle_round_trip(fitted, tmp_path, kind):
+    model, encoder, X = fitted
+    X_encoded = np.asarray(encoder.transform(X.drop(columns='heart_disease'), y=None, override_return_df=False))
+    student = DISTILLED_KINDS[kind]().fit(X_encoded, model.predict_proba(X_encoded)[:, 1])
+    path = tmp_path / 'distilled_model.pkl'
+    with open(path, 'wb') as f:
+        pkl.dump(student, f)
+
+    loaded = load_scoring_model(model, tier='distilled', distilled_path=str(path))
+    np.testing.assert_array_equal(loaded.predict_proba(X_encoded), student.predict_proba(X_encoded))
+
+
+def test_cli_output_loads_as_scoring_tier(fitted, tmp_path):
+    model, encoder, X = fitted
+    for name, artifact in [('model.pkl', model), ('encoder.pkl', encoder)]:
+        with open(tmp_path / name, 'wb') as f:
+            pkl.dump(artifact, f)
+    data = X.assign(heart_disease=np.where(X['heart_disease'] == 1, 'yes', 'no'))
+    data.to_csv(tmp_path / 'data.zip', index=False, compression='zip')
+
+    output = tmp_path / 'distilled_model.pkl'
+    subprocess.run([sys.executable, os.path.join(ROOT, 'distill.py'), '--model', str(tmp_path / 'model.pkl'),
+                    '--encoder', str(tmp_path / 'encoder.pkl'), '--data', str(tmp_path / 'data.zip'),
+                    '--output', str(output)], cwd=ROOT, check=True)
+
+    student = load_scoring_model(model, tier='distilled', distilled_path=str(output))
+    assert type(student).__module__ == 'distill'
+    assert student.predict_proba(np.zeros((1, X.shape[1] - 1))).shape == (1, 2)
@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+pytest.importorskip('scipy')
+
+import drift_monitor
+from drift_monitor import DriftMonitor, build_reference
+from features import FEATURE_OPTIONS
+
+
+@pytest.fixture(scope='module')
+def reference_data():
+    # Skewed option frequencies like the survey's, so pairs have many rare cells
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({feature: rng.choice(options, 50000, p=rng.dirichlet(np.full(len(options), 0.5)))
+                         for feature, options in FEATURE_OPTIONS.items()})
+
+
+@pytest.fixture(scope='module')
+def reference(reference_data):
+    return build_reference(reference_data)
+
+
+def observe_all(monitor, frame):
+    for profile in frame.to_dict('records'):
+        monitor.observe(profile)
+
+
+def flagged(report):
+    return ([feature for feature, result in report['features'].items() if result['status'] != 'stable']
+            + [pair['pair'] for pair in report['top_pairs'] if pair['status'] != 'stable'])
+
+
+def test_in_distribution_sample_is_not_drift(reference, reference_data):
+    monitor = DriftMonitor(reference)
+    observe_all(monitor, reference_data.sample(200, random_state=0))
+    report = monitor.report(force=True)
+    assert report['window_observed'] == 200
+    assert flagged(report) == []
+
+
+def test_shifted_feature_is_drift(reference, reference_data):
+    monitor = DriftMonitor(reference)
+    observe_all(monitor, reference_data.sample(300, random_state=0).assign(
+        smoking_status=FEATURE_OPTIONS['smoking_status'][0]))
+    report = monitor.report(force=True)
+    assert report['features']['smoking_status']['status'] == 'significant'
+    assert 'smoking_status' in report['top_pairs'][0]['pair']
+
+
+def test_report_covers_rolling_window(reference, reference_data, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(drift_monitor.time, 'monotonic', lambda: clock[0])
+    monitor = DriftMonitor(reference, window=3600, buckets=12)
+    observe_all(monitor, reference_data.head(30))
+    clock[0] = 1800.0
+    observe_all(monitor, reference_data.tail(20))
+    assert monitor.report(force=True)['window_observed'] == 50
+
+    # The first profiles leave the window once their bucket is an hour old
+    clock[0] = 3600.0
+    report = monitor.report(force=True)
+    assert report['window_observed'] == 20
+    assert report['observed'] == 50
@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip('onnxruntime')
+pytest.importorskip('onnxmltools')
+onnx = pytest.importorskip('onnx')
+pd = pytest.importorskip('pandas')
+
+from features import FEATURE_NAMES
+from onnx_export import PARITY_TOLERANCE, OnnxRiskModel, check_parity, export_onnx
+from whatif import single_field_variants
+
+
+@pytest.fixture(scope='module')
+def exported(fitted, tmp_path_factory):
+    model, encoder, _ = fitted
+    path = tmp_path_factory.mktemp('onnx') / 'heart_model.onnx'
+    onnx.save(export_onnx(model, encoder), str(path))
+    return OnnxRiskModel(str(path))
+
+
+def test_predict_proba_parity(fitted, exported):
+    model, encoder, data = fitted
+    X = data[FEATURE_NAMES].head(500)
+    # Every single-field variant of one profile too, so every option's encoding is exercised
+    variants = pd.DataFrame([variant for _, _, variant in single_field_variants(X.iloc[0].to_dict())])
+    parity = check_parity(exported, model, encoder, pd.concat([X, variants], ignore_index=True))
+    assert parity['rows'] == len(X) + len(variants)
+    assert parity['max_abs_error'] <= PARITY_TOLERANCE
+
+
+def test_predict_risk_matches_native(fitted, exported):
+    model, encoder, data = fitted
+    profile = data[FEATURE_NAMES].iloc[0].to_dict()
+    native = model.predict_proba(encoder.transform(pd.DataFrame([profile]), y=None, override_return_df=False))[0, 1]
+    assert exported.predict_risk(profile) == pytest.approx(native * 100, abs=PARITY_TOLERANCE * 100)
@@ -0,0 +1,45 @@
+# Incremental re-scoring must give the same risk as a full predict_proba of
+# the ensemble (the fitted fixture in conftest.py).
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+pytest.importorskip('lightgbm')
+
+from rescoring import PARITY_TOLERANCE, IncrementalScorer
+from whatif import single_field_variants
+
+
+@pytest.fixture(scope='module')
+def profiles(fitted):
+    return fitted[2].iloc[:20].drop(columns='heart_disease').to_dict('records')
+
+
+def native_risk(model, encoder, profiles):
+    return model.predict_proba(encoder.transform(pd.DataFrame(profiles), y=None, override_return_df=False))[:, 1] * 100
+
+
+def test_full_score_matches_predict_proba(fitted, profiles):
+    model, encoder, _ = fitted
+    scorer = IncrementalScorer(model, encoder)
+    risks = [scorer.score(profile).risk for profile in profiles]
+    np.testing.assert_allclose(risks, native_risk(model, encoder, profiles), atol=PARITY_TOLERANCE)
+
+
+def test_single_field_edit_matches_predict_proba(fitted, profiles):
+    model, encoder, _ = fitted
+    scorer = IncrementalScorer(model, encoder)
+    for profile in profiles:
+        base = scorer.score(profile)
+        edits = [variant for _, _, variant in single_field_variants(profile)]
+        risks = [scorer.score(edited, base).risk for edited in edits]
+        np.testing.assert_allclose(risks, native_risk(model, encoder, edits), atol=PARITY_TOLERANCE)
+
+
+def test_score_changes_matches_predict_proba(fitted, profiles):
+    model, encoder, _ = fitted
+    scorer = IncrementalScorer(model, encoder)
+    variants = single_field_variants(profiles[0])
+    risks = scorer.score_changes(profiles[0], [{feature: option} for feature, option, _ in variants])
+    expected = native_risk(model, encoder, [variant for _, _, variant in variants])
+    np.testing.assert_allclose(risks, expected, atol=PARITY_TOLERANCE)
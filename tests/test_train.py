@@ -0,0 +1,24 @@
+import pytest
+
+ce = pytest.importorskip('category_encoders')
+lightgbm = pytest.importorskip('lightgbm')
+pytest.importorskip('imblearn')
+
+from train import config_key, encoder_settings, library_versions
+
+
+def model_key(seed=42):
+    return config_key('model', 'data', encoder_settings(seed), 10, seed, {}, library_versions())
+
+
+def test_model_key_covers_encoder_and_library_versions(monkeypatch):
+    key = model_key()
+    assert model_key() == key
+    assert encoder_settings(42)['mode'] == 'ordered'
+    assert encoder_settings(42)['params']['random_state'] == 42
+
+    monkeypatch.setattr(ce, '__version__', '0.0.0')
+    assert model_key() != key
+    monkeypatch.undo()
+    monkeypatch.setattr(lightgbm, '__version__', '0.0.0')
+    assert model_key() != key
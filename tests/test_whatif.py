@@ -0,0 +1,36 @@
+# Lifestyle suggestions only ever move a field towards its healthy band.
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from whatif import HEALTH_RANKS, _reachable, is_healthier
+
+
+@pytest.mark.parametrize('feature, current, option', [
+    ('BMI', 'obese_bmi_30_or_more', 'underweight_bmi_less_than_18_5'),
+    ('BMI', 'normal_weight_bmi_18_5_to_24_9', 'underweight_bmi_less_than_18_5'),
+    ('sleep_category', 'very_short_sleep_0_to_3_hours', 'long_sleep_9_to_10_hours'),
+    ('sleep_category', 'very_long_sleep_11_or_more_hours', 'short_sleep_4_to_5_hours'),
+    ('drinks_category', 'did_not_drink', 'low_consumption_1.01_to_5_drinks'),
+])
+def test_unhealthy_moves_are_never_suggested(feature, current, option):
+    assert not _reachable(feature, current, option)
+
+
+@pytest.mark.parametrize('feature, current, option', [
+    ('BMI', 'obese_bmi_30_or_more', 'overweight_bmi_25_to_29_9'),
+    ('BMI', 'underweight_bmi_less_than_18_5', 'normal_weight_bmi_18_5_to_24_9'),
+    ('sleep_category', 'very_short_sleep_0_to_3_hours', 'short_sleep_4_to_5_hours'),
+    ('sleep_category', 'long_sleep_9_to_10_hours', 'normal_sleep_6_to_8_hours'),
+    ('smoking_status', 'current_smoker_every_day', 'former_smoker'),
+])
+def test_moves_towards_the_healthy_band_are_suggested(feature, current, option):
+    assert _reachable(feature, current, option)
+
+
+def test_no_move_from_the_healthy_band():
+    for feature, ranks in HEALTH_RANKS.items():
+        healthy = [option for option, rank in ranks.items() if rank == 0]
+        for current in healthy:
+            assert not any(is_healthier(feature, current, option) for option in ranks)
@@ -0,0 +1,223 @@
+"""Reproducible training pipeline for the encoder and EasyEnsemble(LightGBM) model.
+
+Stages, each timed:
+    load      read the BRFSS dataset
+    encode    fit the CatBoostEncoder and encode the full matrix with ordered
+              target statistics, or reuse the cache
+    fit       fit the ensemble members in parallel within a total thread budget
+    save      write the versioned artifacts and manifest
+
+The encoded matrix is cached under cache/<key>/, keyed on the dataset hash and
+encoder settings (parameters, ordered encoding mode, category_encoders version). It is kept twice: as a memory-mapped .npy that the
+scikit-learn style ensemble is fitted from, and as a LightGBM binary Dataset
+for native LightGBM consumers such as the hyperparameter search in tune.py.
+
+Artifacts go to models/<version>/, where the version is derived from the
+dataset hash, the encoder settings, the training configuration and the
+lightgbm, imbalanced-learn and category_encoders versions, so the same inputs
+always produce the same version:
+
+    python train.py --members 10 --threads 8 --parallel-members 4 --publish
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle as pkl
+import shutil
+import time
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+from features import FEATURE_NAMES
+
+CACHE_DIR = 'cache'
+MODELS_DIR = 'models'
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def config_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class StageTimer:
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        print(f"[{name}] ...", flush=True)
+        start = time.perf_counter()
+        yield
+        self.timings[name] = time.perf_counter() - start
+        print(f"[{name}] {self.timings[name]:.1f}s", flush=True)
+
+
+def make_encoder(seed):
+    import category_encoders as ce
+
+    return ce.CatBoostEncoder(cols=FEATURE_NAMES, random_state=seed)
+
+
+def encoder_settings(seed):
+    # Everything that changes the encoded matrix: every encoder parameter including the
+    # library defaults, the ordered fit_transform mode and the library version
+    import category_encoders as ce
+
+    return {'encoder': 'CatBoostEncoder', 'params': make_encoder(seed).get_params(), 'mode': 'ordered',
+            'category_encoders': ce.__version__}
+
+
+class NullTimer:
+    def stage(self, name):
+        return nullcontext()
+
+
+def encoded_dataset(data_path, data_sha, seed, cache_dir=CACHE_DIR, timer=None):
+    """Return (encoder, encoded matrix, labels, cache directory), building the cache on a miss."""
+    import lightgbm as lgb
+
+    from artifacts import load_encoder, load_reference_data, split_features
+
+    timer = timer or NullTimer()
+
+    key = config_key('encoded', data_sha, encoder_settings(seed))
+    path = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(path, 'complete')):
+        encoder = load_encoder(os.path.join(path, 'encoder.pkl'))
+        X_encoded = np.load(os.path.join(path, 'encoded.npy'), mmap_mode='r')
+        labels = np.load(os.path.join(path, 'labels.npy'))
+        print(f"encoded cache hit: {path}")
+        return encoder, X_encoded, labels, path
+
+    with timer.stage('load'):
+        data = load_reference_data(data_path)
+        X, labels = split_features(data)
+
+    with timer.stage('encode'):
+        # fit_transform with the labels encodes each row from the rows before it (CatBoost's
+        # ordered statistics), so no row's own label leaks into its encoding. transform, as
+        # used at inference, gives the statistics over all training rows.
+        encoder = make_encoder(seed)
+        X_encoded = np.ascontiguousarray(
+            encoder.fit_transform(X, labels), dtype=np.float32)
+
+    with timer.stage('cache'):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, 'encoder.pkl'), 'wb') as f:
+            pkl.dump(encoder, f)
+        np.save(os.path.join(path, 'encoded.npy'), X_encoded)
+        np.save(os.path.join(path, 'labels.npy'), labels)
+        dataset = lgb.Dataset(X_encoded, label=labels, feature_name=FEATURE_NAMES,
+                              params={'verbose': -1, 'seed': seed})
+        dataset.save_binary(os.path.join(path, 'encoded.bin'))
+        # Written last so an interrupted run is never mistaken for a complete cache
+        open(os.path.join(path, 'complete'), 'w').close()
+
+    return encoder, X_encoded, labels, path
+
+
+def build_ensemble(members, seed, threads_per_member, parallel_members, lgbm_params=None):
+    from imblearn.ensemble import EasyEnsembleClassifier
+    from lightgbm import LGBMClassifier
+
+    params = {'random_state': seed, 'n_jobs': threads_per_member, 'deterministic': True,
+              'force_row_wise': True, 'verbose': -1}
+    params.update(lgbm_params or {})
+    return EasyEnsembleClassifier(
+        n_estimators=members, estimator=LGBMClassifier(**params),
+        n_jobs=parallel_members, random_state=seed)
+
+
+def library_versions():
+    # The fitted trees and the members' undersampling depend on these
+    import imblearn
+    import lightgbm
+
+    return {'lightgbm': lightgbm.__version__, 'imbalanced-learn': imblearn.__version__}
+
+
+def thread_split(threads, parallel_members):
+    # Members fitted at once x LightGBM threads per member never exceeds the budget
+    parallel_members = max(1, min(parallel_members, threads))
+    return parallel_members, max(1, threads // parallel_members)
+
+
+def train(data_path, members=10, seed=42, threads=None, parallel_members=None, lgbm_params=None,
+          cache_dir=CACHE_DIR, models_dir=MODELS_DIR):
+    timer = StageTimer()
+    threads = threads or os.cpu_count()
+    parallel_members, threads_per_member = thread_split(threads, parallel_members or threads)
+
+    data_sha = file_sha256(data_path)
+    encoder, X_encoded, labels, cache_path = encoded_dataset(data_path, data_sha, seed, cache_dir, timer)
+
+    with timer.stage('fit'):
+        model = build_ensemble(members, seed, threads_per_member, parallel_members, lgbm_params)
+        model.fit(X_encoded, labels)
+
+    versions = library_versions()
+    version = config_key('model', data_sha, encoder_settings(seed), members, seed, lgbm_params or {}, versions)
+    out_dir = os.path.join(models_dir, version)
+    with timer.stage('save'):
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(out_dir, 'best_model.pkl'), 'wb') as f:
+            pkl.dump(model, f)
+        with open(os.path.join(out_dir, 'cbe_encoder.pkl'), 'wb') as f:
+            pkl.dump(encoder, f)
+        manifest = {
+            'version': version,
+            'data_path': data_path,
+            'data_sha256': data_sha,
+            'rows': int(len(labels)),
+            'members': members,
+            'seed': seed,
+            'lgbm_params': lgbm_params or {},
+            'encoder': encoder_settings(seed),
+            'libraries': versions,
+            'threads': threads,
+            'parallel_members': parallel_members,
+            'threads_per_member': threads_per_member,
+            'encoded_cache': cache_path,
+            'timings_seconds': timer.timings,
+        }
+        with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    return out_dir, manifest
+
+
+if __name__ == '__main__':
+    from artifacts import DATA_PATH, ENCODER_PATH, MODEL_PATH
+
+    parser = argparse.ArgumentParser(description='Train the encoder and EasyEnsemble(LightGBM) model.')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--members', type=int, default=10, help='number of ensemble members')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--threads', type=int, default=None, help='total thread budget (default: all cores)')
+    parser.add_argument('--parallel-members', type=int, default=None,
+                        help='members fitted at once (default: one per thread)')
+    parser.add_argument('--params', default=None, help='JSON dict of extra LGBMClassifier parameters')
+    parser.add_argument('--publish', action='store_true',
+                        help='copy the trained artifacts to the paths the apps load from')
+    args = parser.parse_args()
+
+    out_dir, manifest = train(args.data, args.members, args.seed, args.threads, args.parallel_members,
+                              json.loads(args.params) if args.params else None)
+
+    print(f"model version {manifest['version']} written to {out_dir}")
+    for stage, seconds in manifest['timings_seconds'].items():
+        print(f"  {stage:<7} {seconds:8.1f}s")
+
+    if args.publish:
+        shutil.copyfile(os.path.join(out_dir, 'best_model.pkl'), MODEL_PATH)
+        shutil.copyfile(os.path.join(out_dir, 'cbe_encoder.pkl'), ENCODER_PATH)
+        print(f"published to {MODEL_PATH} and {ENCODER_PATH}")
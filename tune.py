@@ -0,0 +1,218 @@
+"""Successive halving / Hyperband search over the LightGBM members of the ensemble.
+
+Trials run on the encoded cache written by train.py, so the encoder is never
+refitted. Training reads the LightGBM binary Dataset (encoded.bin) and takes
+subsets of it without re-binning. Validation scoring reads the memory-mapped
+encoded.npy. Each trial fits an EasyEnsemble-style set of boosters: every
+member sees all positives and an equal-sized random draw of negatives. Members
+use early stopping on a fixed validation split.
+
+The resource grows at each rung: the fraction of training rows and the number
+of members both go up by a factor of eta, and only the best 1/eta of trials
+move on. Trials inside a rung run in parallel worker processes. The objective
+is validation ROC AUC minus latency_weight x single-row latency in ms, so
+faster models can be preferred on purpose:
+
+    python tune.py --trials 27 --workers 4 --latency-weight 0.002
+
+The best parameters are printed in LGBMClassifier form for train.py --params.
+"""
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from train import CACHE_DIR
+
+SEARCH_SPACE = {
+    'num_leaves': [7, 15, 31, 63, 127],
+    'learning_rate': [0.02, 0.05, 0.1, 0.2],
+    'min_child_samples': [20, 50, 100, 200],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+    'reg_lambda': [0.0, 1.0, 10.0],
+    'max_depth': [-1, 4, 6, 8],
+}
+MAX_BOOST_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 30
+
+_worker_state = {}
+
+
+def sample_configs(n, seed):
+    rng = np.random.default_rng(seed)
+    return [{name: values[rng.integers(len(values))] for name, values in SEARCH_SPACE.items()}
+            for _ in range(n)]
+
+
+def _init_worker(cache_path, train_idx, valid_idx):
+    import lightgbm as lgb
+
+    dataset = lgb.Dataset(os.path.join(cache_path, 'encoded.bin'), params={'verbose': -1}).construct()
+    _worker_state['dataset'] = dataset
+    _worker_state['X'] = np.load(os.path.join(cache_path, 'encoded.npy'), mmap_mode='r')
+    _worker_state['labels'] = np.load(os.path.join(cache_path, 'labels.npy'))
+    _worker_state['train_idx'] = train_idx
+    _worker_state['valid_idx'] = valid_idx
+
+
+def _roc_auc(labels, scores):
+    # Rank-based AUC with average ranks for ties
+    order = np.argsort(scores, kind='mergesort')
+    ranks = np.empty(len(scores))
+    sorted_scores = scores[order]
+    _, first, counts = np.unique(sorted_scores, return_index=True, return_counts=True)
+    ranks[order] = np.repeat(first + (counts + 1) / 2, counts)
+    n_pos = labels.sum()
+    n_neg = len(labels) - n_pos
+    return (ranks[labels == 1].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def run_trial(config, fraction, members, threads, seed):
+    """Fit one ensemble on a subsample of the training rows and score it on the validation split."""
+    import lightgbm as lgb
+
+    dataset = _worker_state['dataset']
+    X = _worker_state['X']
+    labels = _worker_state['labels']
+    rng = np.random.default_rng(seed)
+
+    train_idx = _worker_state['train_idx']
+    train_idx = np.sort(rng.choice(train_idx, size=max(1, int(len(train_idx) * fraction)), replace=False))
+    valid_idx = _worker_state['valid_idx']
+    valid = dataset.subset(valid_idx)
+
+    positives = train_idx[labels[train_idx] == 1]
+    negatives = train_idx[labels[train_idx] == 0]
+    params = {'objective': 'binary', 'metric': 'auc', 'num_threads': threads, 'verbose': -1,
+              'deterministic': True, 'force_row_wise': True, **config}
+
+    start = time.perf_counter()
+    boosters = []
+    for member in range(members):
+        member_idx = np.sort(np.concatenate([
+            positives, rng.choice(negatives, size=min(len(positives), len(negatives)), replace=False)]))
+        booster = lgb.train(
+            {**params, 'seed': seed + member}, dataset.subset(member_idx),
+            num_boost_round=MAX_BOOST_ROUNDS, valid_sets=[valid],
+            callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)])
+        boosters.append(booster)
+    fit_seconds = time.perf_counter() - start
+
+    X_valid = np.asarray(X[valid_idx], dtype=np.float64)
+    scores = np.mean([booster.predict(X_valid, num_iteration=booster.best_iteration) for booster in boosters], axis=0)
+    auc = _roc_auc(labels[valid_idx], scores)
+
+    # Single-row latency of the whole ensemble, as served per request
+    row = X_valid[:1]
+    repeats = 50
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for booster in boosters:
+            booster.predict(row, num_iteration=booster.best_iteration, num_threads=1)
+    latency_ms = (time.perf_counter() - start) / repeats * 1000
+
+    return {
+        'config': config,
+        'fraction': fraction,
+        'members': members,
+        'auc': float(auc),
+        'latency_ms': latency_ms,
+        'best_iterations': [int(booster.best_iteration) for booster in boosters],
+        'fit_seconds': fit_seconds,
+    }
+
+
+def successive_halving(executor, configs, rungs, eta, threads_per_trial, latency_weight, seed):
+    """Run configs through the rungs, keeping the best 1/eta after each one."""
+    history = []
+    for rung, (fraction, members) in enumerate(rungs):
+        # Same seed for every trial of a rung so they see the same rows
+        futures = [executor.submit(run_trial, config, fraction, members, threads_per_trial, seed + rung)
+                   for config in configs]
+        results = [future.result() for future in futures]
+        for result in results:
+            result['rung'] = rung
+            result['objective'] = result['auc'] - latency_weight * result['latency_ms']
+        results.sort(key=lambda result: result['objective'], reverse=True)
+        history.extend(results)
+        print(f"  rung {rung}: {len(results)} trials on {fraction:.0%} of rows with {members} member(s), "
+              f"best AUC {results[0]['auc']:.4f} at {results[0]['latency_ms']:.2f} ms", flush=True)
+        configs = [result['config'] for result in results[:max(1, len(results) // eta)]]
+    return history
+
+
+def bracket_rungs(n_rungs, eta, min_fraction, max_members):
+    # Geometric resources ending at the full training set and max_members
+    rungs = []
+    for rung in range(n_rungs):
+        scale = eta ** (rung - n_rungs + 1)
+        rungs.append((max(min_fraction, scale), max(1, round(max_members * scale))))
+    return rungs
+
+
+def search(cache_path, trials=27, eta=3, max_members=10, min_fraction=0.05, hyperband=False,
+           workers=4, threads=None, latency_weight=0.0, valid_fraction=0.2, seed=0):
+    labels = np.load(os.path.join(cache_path, 'labels.npy'))
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(labels))
+    n_valid = int(len(order) * valid_fraction)
+    valid_idx, train_idx = np.sort(order[:n_valid]), np.sort(order[n_valid:])
+
+    threads_per_trial = max(1, (threads or os.cpu_count()) // workers)
+    max_rungs = max(1, int(math.log(trials, eta) + 1e-9) + 1)
+    # Hyperband: one bracket per starting resource, trading trial count for rung count
+    brackets = range(max_rungs, 0, -1) if hyperband else [max_rungs]
+
+    history = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_path, train_idx, valid_idx)) as executor:
+        for b, n_rungs in enumerate(brackets):
+            n_configs = trials if n_rungs == max_rungs else max(1, int(trials / eta ** (max_rungs - n_rungs)))
+            configs = sample_configs(n_configs, seed + 1000 * b)
+            rungs = bracket_rungs(n_rungs, eta, min_fraction, max_members)
+            print(f"bracket {b}: {n_configs} configs over {n_rungs} rung(s)", flush=True)
+            history.extend(successive_halving(executor, configs, rungs, eta, threads_per_trial,
+                                              latency_weight, seed + 100 * b))
+
+    final_rung = [result for result in history if result['fraction'] >= 1.0 and result['members'] == max_members]
+    best = max(final_rung or history, key=lambda result: result['objective'])
+    return best, history
+
+
+def best_lgbm_params(result):
+    # LGBMClassifier parameters for train.py, n_estimators from early stopping
+    params = dict(result['config'])
+    params['n_estimators'] = int(np.median(result['best_iterations'])) or MAX_BOOST_ROUNDS
+    return params
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Successive halving search over LightGBM member parameters.')
+    parser.add_argument('--cache', required=True, help=f'encoded cache directory written by train.py ({CACHE_DIR}/<key>)')
+    parser.add_argument('--trials', type=int, default=27)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--max-members', type=int, default=10)
+    parser.add_argument('--min-fraction', type=float, default=0.05)
+    parser.add_argument('--hyperband', action='store_true', help='run all Hyperband brackets')
+    parser.add_argument('--workers', type=int, default=4, help='trials run in parallel')
+    parser.add_argument('--threads', type=int, default=None, help='total thread budget (default: all cores)')
+    parser.add_argument('--latency-weight', type=float, default=0.0,
+                        help='AUC given up per ms of single-row ensemble latency')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the full trial history to this file')
+    args = parser.parse_args()
+
+    best, history = search(args.cache, args.trials, args.eta, args.max_members, args.min_fraction,
+                           args.hyperband, args.workers, args.threads, args.latency_weight, seed=args.seed)
+
+    print(f"best: AUC {best['auc']:.4f}, latency {best['latency_ms']:.2f} ms, "
+          f"{best['members']} member(s) on {best['fraction']:.0%} of rows")
+    print(f"train.py --members {best['members']} --params '{json.dumps(best_lgbm_params(best))}'")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(history, f, indent=2)
@@ -0,0 +1,190 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from features import FEATURE_NAMES, FEATURE_OPTIONS, FEATURE_LABELS, MODIFIABLE_FEATURES
+from rescoring import get_rescorer
+
+
+def single_field_variants(input_data, features=None):
+    # Every profile that differs from input_data in exactly one field
+    features = features or list(FEATURE_OPTIONS)
+    variants = []
+    for feature in features:
+        for option in FEATURE_OPTIONS[feature]:
+            if option != input_data[feature]:
+                variant = dict(input_data)
+                variant[feature] = option
+                variants.append((feature, option, variant))
+    return variants
+
+
+def _score_changes(input_data, changes, model, encoder, base=None):
+    # Risk in % of input_data with each dict of changes applied. The LightGBM
+    # ensemble only re-evaluates the trees that split on the changed fields;
+    # other models score the whole batch with predict_proba.
+    rescorer = get_rescorer(model, encoder)
+    if rescorer is not None:
+        return rescorer.score_changes(input_data, changes, base)
+    batch_df = pd.DataFrame([{**input_data, **change} for change in changes])
+    batch_encoded = encoder.transform(batch_df, y=None, override_return_df=False)
+    return model.predict_proba(batch_encoded)[:, 1] * 100
+
+
+def what_if_sweep(input_data, model, encoder, features=None, base=None):
+    """Score all single-field alternatives of input_data in one batch.
+
+    Returns (baseline_risk, DataFrame) where the frame has one row per
+    alternative with its risk and the change against the baseline, both in %.
+    base is an optional rescoring.ScoredProfile of input_data to start from.
+    """
+    variants = single_field_variants(input_data, features)
+
+    # Row 0 is the current profile so the baseline comes from the same batch
+    risks = _score_changes(input_data, [{}] + [{feature: option} for feature, option, _ in variants],
+                           model, encoder, base)
+
+    baseline = risks[0]
+    sweep_df = pd.DataFrame({
+        'Feature': [feature for feature, _, _ in variants],
+        'Factor': [FEATURE_LABELS[feature] for feature, _, _ in variants],
+        'Current': [input_data[feature] for feature, _, _ in variants],
+        'Option': [option for _, option, _ in variants],
+        'Risk': risks[1:],
+        'Delta': risks[1:] - baseline,
+    })
+    sweep_df['Modifiable'] = sweep_df['Feature'].isin(MODIFIABLE_FEATURES)
+    sweep_df['Healthier'] = [is_healthier(feature, input_data[feature], option) for feature, option, _ in variants]
+    return baseline, sweep_df.sort_values(by='Delta').reset_index(drop=True)
+
+
+# Position of each option of a lifestyle field relative to the healthy band at 0, with
+# negative positions below it (too little sleep, underweight). The model learned from
+# observational data, so it can score an unhealthy change (drinking more, sleeping too
+# long, losing weight into underweight) as lowering risk; only moves towards the
+# healthy band, without crossing it, are ever offered as a change.
+HEALTH_RANKS = {
+    'smoking_status': {
+        "never_smoked": 0, "former_smoker": 1, "current_smoker_some_days": 2, "current_smoker_every_day": 3,
+    },
+    'drinks_category': {
+        "did_not_drink": 0, "very_low_consumption_0.01_to_1_drinks": 1, "low_consumption_1.01_to_5_drinks": 2,
+        "moderate_consumption_5.01_to_10_drinks": 3, "high_consumption_10.01_to_20_drinks": 4,
+        "very_high_consumption_more_than_20_drinks": 5,
+    },
+    'binge_drinking_status': {"no": 0, "yes": 1},
+    'exercise_status_in_past_30_Days': {"yes": 0, "no": 1},
+    'sleep_category': {
+        "very_short_sleep_0_to_3_hours": -2, "short_sleep_4_to_5_hours": -1, "normal_sleep_6_to_8_hours": 0,
+        "long_sleep_9_to_10_hours": 1, "very_long_sleep_11_or_more_hours": 2,
+    },
+    'BMI': {
+        "underweight_bmi_less_than_18_5": -1, "normal_weight_bmi_18_5_to_24_9": 0, "overweight_bmi_25_to_29_9": 1,
+        "obese_bmi_30_or_more": 2,
+    },
+}
+
+
+def is_healthier(feature, current, option):
+    # Only fields with a health ranking can be changed, and only closer to the healthy band
+    # from the same side, e.g. obese to overweight or normal weight but never to underweight
+    ranks = HEALTH_RANKS.get(feature)
+    if ranks is None:
+        return False
+    return ranks[option] * ranks[current] >= 0 and abs(ranks[option]) < abs(ranks[current])
+
+
+# Rules out changes nobody can make or should be advised to make,
+# e.g. a smoker can only become a former smoker, nobody is advised to become underweight
+def _reachable(feature, current, option):
+    if feature == 'smoking_status' and option == 'never_smoked':
+        return False
+    if feature == 'BMI' and option == 'underweight_bmi_less_than_18_5':
+        return False
+    return is_healthier(feature, current, option)
+
+
+# Per-profile cache of optimizer results, shared by every session of the process
+PLAN_CACHE_SIZE = 512
+_plan_cache = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+
+def optimize_lifestyle(input_data, model, encoder, target=25, max_plans=5, features=None, version=None):
+    """Find the smallest sets of lifestyle changes that bring risk to or below target (%).
+
+    Plans are searched by increasing size. Each level is scored in a single
+    predict_proba batch and the search stops at the first size that yields
+    max_plans plans under the target. Pruning:
+      - only options that are healthier (HEALTH_RANKS) and lower risk on their
+        own are tried for a field,
+      - plans containing a smaller plan that already reaches the target are skipped.
+
+    Returns a list of {'changes': {feature: option}, 'risk': float,
+    'reaches_target': bool}, ranked by number of changes and then risk. If no
+    plan reaches the target, the lowest-risk plans are returned instead.
+
+    Results are cached per profile when version (artifacts.model_version of
+    the model) is given.
+    """
+    features = list(features or MODIFIABLE_FEATURES)
+    if version is None:
+        return _search_plans(input_data, model, encoder, target, max_plans, features)
+
+    key = (tuple(input_data[f] for f in FEATURE_NAMES), target, max_plans, tuple(features), version)
+    with _plan_cache_lock:
+        if key in _plan_cache:
+            _plan_cache.move_to_end(key)
+            return _plan_cache[key]
+
+    plans = _search_plans(input_data, model, encoder, target, max_plans, features)
+
+    with _plan_cache_lock:
+        _plan_cache[key] = plans
+        while len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plans
+
+
+def _search_plans(input_data, model, encoder, target, max_plans, features):
+    _, sweep_df = what_if_sweep(input_data, model, encoder, features)
+
+    # Candidate options per field: those that improve on the current value alone
+    candidates = {}
+    for row in sweep_df[sweep_df['Delta'] < 0].itertuples():
+        if _reachable(row.Feature, input_data[row.Feature], row.Option):
+            candidates.setdefault(row.Feature, []).append(row.Option)
+    fields = [feature for feature in features if feature in candidates]
+
+    successes = []
+    scored = []
+    for size in range(1, len(fields) + 1):
+        level = []
+        for combo in itertools.combinations(fields, size):
+            for options in itertools.product(*(candidates[feature] for feature in combo)):
+                changes = dict(zip(combo, options))
+                # A superset of a successful plan is never minimal
+                if any(plan['changes'].items() <= changes.items() for plan in successes):
+                    continue
+                level.append(changes)
+        if not level:
+            break
+
+        risks = _score_changes(input_data, level, model, encoder)
+
+        for changes, risk in zip(level, risks):
+            plan = {'changes': changes, 'risk': float(risk), 'reaches_target': bool(risk <= target)}
+            if plan['reaches_target']:
+                successes.append(plan)
+            else:
+                scored.append(plan)
+        if len(successes) >= max_plans:
+            break
+
+    if successes:
+        ranked = sorted(successes, key=lambda plan: (len(plan['changes']), plan['risk']))
+    else:
+        ranked = sorted(scored, key=lambda plan: (plan['risk'], len(plan['changes'])))
+    return ranked[:max_plans]